@@ -44,6 +44,8 @@ export interface Product {
   is_featured: boolean;
   category_id?: number;
   category?: Category;
+  average_rating?: number;
+  total_reviews?: number;
   created_at: string;
   updated_at?: string;
 }
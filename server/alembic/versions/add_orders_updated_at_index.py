@@ -0,0 +1,23 @@
+"""add orders updated_at index
+
+Revision ID: add_orders_updated_at_index
+Revises: add_stat_counter_deltas
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_orders_updated_at_index'
+down_revision = 'add_stat_counter_deltas'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_orders_updated_at', 'orders', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_orders_updated_at', table_name='orders')
@@ -0,0 +1,32 @@
+"""add keyset pagination indexes
+
+Revision ID: add_pagination_indexes
+Revises: add_product_search
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_pagination_indexes'
+down_revision = 'add_product_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'], unique=False)
+    op.create_index('ix_orders_user_id_created_at_id', 'orders', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index(
+        'ix_product_reviews_product_id_created_at_id',
+        'product_reviews',
+        ['product_id', 'created_at', 'id'],
+        unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_product_reviews_product_id_created_at_id', table_name='product_reviews')
+    op.drop_index('ix_orders_user_id_created_at_id', table_name='orders')
+    op.drop_index('ix_orders_created_at_id', table_name='orders')
@@ -0,0 +1,53 @@
+"""add product rating summaries
+
+Revision ID: add_product_rating_summaries
+Revises: add_pagination_indexes
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_rating_summaries'
+down_revision = 'add_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'product_rating_summaries',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('total_reviews', sa.Integer(), nullable=False),
+        sa.Column('rating_sum', sa.Integer(), nullable=False),
+        sa.Column('rating_1', sa.Integer(), nullable=False),
+        sa.Column('rating_2', sa.Integer(), nullable=False),
+        sa.Column('rating_3', sa.Integer(), nullable=False),
+        sa.Column('rating_4', sa.Integer(), nullable=False),
+        sa.Column('rating_5', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+    # Backfill from the existing reviews
+    op.execute("""
+        INSERT INTO product_rating_summaries
+            (product_id, total_reviews, rating_sum, rating_1, rating_2, rating_3, rating_4, rating_5)
+        SELECT
+            product_id,
+            COUNT(*),
+            SUM(rating),
+            SUM(CASE WHEN rating = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 2 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 3 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 4 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 5 THEN 1 ELSE 0 END)
+        FROM product_reviews
+        GROUP BY product_id
+    """)
+
+
+def downgrade():
+    op.drop_table('product_rating_summaries')
@@ -0,0 +1,42 @@
+"""add product full-text search
+
+Revision ID: add_product_search
+Revises: add_hero_banner_buttons
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_search'
+down_revision = 'add_hero_banner_buttons'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from search import POSTGRES_SEARCH_DDL, SQLITE_SEARCH_DDL
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        statements = POSTGRES_SEARCH_DDL
+    elif dialect == 'sqlite':
+        statements = SQLITE_SEARCH_DDL
+    else:
+        return
+
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_products_search_vector')
+        op.execute('ALTER TABLE products DROP COLUMN IF EXISTS search_vector')
+    elif dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS products_fts_au')
+        op.execute('DROP TRIGGER IF EXISTS products_fts_ad')
+        op.execute('DROP TRIGGER IF EXISTS products_fts_ai')
+        op.execute('DROP TABLE IF EXISTS products_fts')
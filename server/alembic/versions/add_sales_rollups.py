@@ -0,0 +1,54 @@
+"""add sales rollups
+
+Revision ID: add_sales_rollups
+Revises: add_stat_counters
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_sales_rollups'
+down_revision = 'add_stat_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'order_rollups',
+        sa.Column('granularity', sa.String(length=5), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('granularity', 'bucket')
+    )
+    op.create_table(
+        'sales_rollups',
+        sa.Column('granularity', sa.String(length=5), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('granularity', 'bucket', 'product_id')
+    )
+    # No watermark yet: the first scheduler run backfills all history
+    op.create_table(
+        'rollup_watermarks',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('last_order_id', sa.Integer(), nullable=False),
+        sa.Column('last_order_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('rollup_watermarks')
+    op.drop_table('sales_rollups')
+    op.drop_table('order_rollups')
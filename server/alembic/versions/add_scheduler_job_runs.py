@@ -0,0 +1,35 @@
+"""add scheduler job runs
+
+Revision ID: add_scheduler_job_runs
+Revises: add_users_cleanup_index
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_scheduler_job_runs'
+down_revision = 'add_users_cleanup_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'scheduler_job_runs',
+        sa.Column('job_id', sa.String(length=100), nullable=False),
+        sa.Column('holder', sa.String(), nullable=True),
+        sa.Column('last_status', sa.String(length=20), nullable=True),
+        sa.Column('last_started_at', sa.DateTime(), nullable=True),
+        sa.Column('last_finished_at', sa.DateTime(), nullable=True),
+        sa.Column('last_duration_seconds', sa.Float(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('run_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('job_id')
+    )
+
+
+def downgrade():
+    op.drop_table('scheduler_job_runs')
@@ -0,0 +1,43 @@
+"""add stat counters
+
+Revision ID: add_stat_counters
+Revises: add_email_outbox
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_stat_counters'
+down_revision = 'add_email_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stat_counters',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # Seed from the existing data
+    op.execute("""
+        INSERT INTO stat_counters (name, value)
+        SELECT 'total_orders', COUNT(*) FROM orders
+        UNION ALL
+        SELECT 'total_revenue', COALESCE(SUM(total_amount), 0) FROM orders
+        UNION ALL
+        SELECT 'pending_orders', COUNT(*) FROM orders WHERE status = 'PENDING'
+        UNION ALL
+        SELECT 'total_products', COUNT(*) FROM products
+        UNION ALL
+        SELECT 'total_customers', COUNT(*) FROM users WHERE role = 'CUSTOMER'
+    """)
+
+
+def downgrade():
+    op.drop_table('stat_counters')
@@ -0,0 +1,23 @@
+"""add users cleanup index
+
+Revision ID: add_users_cleanup_index
+Revises: add_sales_rollups
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_users_cleanup_index'
+down_revision = 'add_sales_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_is_verified_created_at', 'users', ['is_verified', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_is_verified_created_at', table_name='users')
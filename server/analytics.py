@@ -0,0 +1,248 @@
+"""
+Sales analytics rollups
+
+``order_rollups`` holds orders, revenue and units per hour and per day and
+``sales_rollups`` the same per product (with its category), all in UTC
+buckets. The scheduler folds new orders in incrementally, tracked by an
+order id watermark. The watermark only sees new orders, so every run also
+recomputes a trailing window, plus the days of older orders updated within
+it, to pick up status and amount changes to orders already rolled up.
+Every run recomputes whole days from ``orders``, so it is idempotent and
+also catches orders that committed after a higher id. Analytics queries
+only ever read the rollups.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from models import (
+    Order, OrderItem, Product, Category, OrderRollup, SalesRollup, RollupWatermark
+)
+
+GRANULARITIES = ("hour", "day")
+WATERMARK_NAME = "sales_rollups"
+
+DAY = timedelta(days=1)
+
+
+def _utc(value: datetime) -> datetime:
+    """Naive UTC, the form buckets are stored in"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def truncate(value: datetime, granularity: str) -> datetime:
+    value = _utc(value).replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        value = value.replace(hour=0)
+    return value
+
+
+def rollup_days(db: Session, start: datetime, end: datetime):
+    """Recompute every bucket of the whole days in [start, end) in the caller's transaction"""
+    start = truncate(start, "day")
+    end = truncate(end - timedelta(microseconds=1), "day") + DAY
+
+    orders = defaultdict(lambda: {"orders": 0, "revenue": 0.0, "units": 0})
+    sales = defaultdict(lambda: {"category_id": None, "orders": set(), "units": 0, "revenue": 0.0})
+
+    order_rows = db.query(Order.id, Order.created_at, Order.total_amount).filter(
+        Order.created_at >= start, Order.created_at < end
+    )
+    for order_id, created_at, total_amount in order_rows:
+        for granularity in GRANULARITIES:
+            entry = orders[(granularity, truncate(created_at, granularity))]
+            entry["orders"] += 1
+            entry["revenue"] += total_amount
+
+    item_rows = (
+        db.query(
+            Order.id, Order.created_at, OrderItem.product_id,
+            Product.category_id, OrderItem.quantity, OrderItem.price
+        )
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .filter(Order.created_at >= start, Order.created_at < end)
+    )
+    for order_id, created_at, product_id, category_id, quantity, price in item_rows:
+        for granularity in GRANULARITIES:
+            bucket = truncate(created_at, granularity)
+            orders[(granularity, bucket)]["units"] += quantity
+            entry = sales[(granularity, bucket, product_id)]
+            entry["category_id"] = category_id
+            entry["orders"].add(order_id)
+            entry["units"] += quantity
+            entry["revenue"] += price * quantity
+
+    for model in (OrderRollup, SalesRollup):
+        db.query(model).filter(model.bucket >= start, model.bucket < end).delete(synchronize_session=False)
+
+    if orders:
+        db.execute(insert(OrderRollup), [
+            {"granularity": granularity, "bucket": bucket, **entry}
+            for (granularity, bucket), entry in orders.items()
+        ])
+    if sales:
+        db.execute(insert(SalesRollup), [
+            {
+                "granularity": granularity,
+                "bucket": bucket,
+                "product_id": product_id,
+                "category_id": entry["category_id"],
+                "orders": len(entry["orders"]),
+                "units": entry["units"],
+                "revenue": entry["revenue"],
+            }
+            for (granularity, bucket, product_id), entry in sales.items()
+        ])
+
+
+def rollup_day(db: Session, moment: datetime):
+    """Recompute the day containing ``moment``, e.g. after an order in it was deleted"""
+    day = truncate(moment, "day")
+    rollup_days(db, day, day + DAY)
+
+
+def backfill_rollups(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+    """Recompute [start, end) one day per transaction; defaults to all history. Returns days processed"""
+    if start is None:
+        start = db.query(func.min(Order.created_at)).scalar()
+        if start is None:
+            return 0
+    if end is None:
+        end = datetime.utcnow() + DAY
+
+    day = truncate(start, "day")
+    end = _utc(end)
+    days = 0
+    while day < end:
+        rollup_days(db, day, day + DAY)
+        db.commit()
+        day += DAY
+        days += 1
+    return days
+
+
+def roll_up_new_orders(db: Session, recompute_hours: int) -> int:
+    """Fold orders past the watermark into the rollups and recompute the last
+    ``recompute_hours``; returns the number of new orders"""
+    watermark = db.get(RollupWatermark, WATERMARK_NAME)
+    last_order_id = watermark.last_order_id if watermark else 0
+
+    count, max_id, first_at, last_at = db.query(
+        func.count(Order.id), func.max(Order.id), func.min(Order.created_at), func.max(Order.created_at)
+    ).filter(Order.id > last_order_id).one()
+
+    now = datetime.utcnow()
+    start = now - timedelta(hours=recompute_hours)
+    end = now
+    # Older orders whose status or amount changed within the window
+    changed_days = {
+        truncate(created_at, "day")
+        for (created_at,) in db.query(Order.created_at).filter(
+            Order.updated_at >= start, Order.created_at < start
+        )
+    }
+
+    if count:
+        # Start from the previous watermark's day so orders that committed
+        # late with a lower id are still counted
+        start = min(start, _utc(first_at))
+        if watermark is not None:
+            start = min(start, watermark.last_order_at)
+        end = max(end, _utc(last_at) + timedelta(microseconds=1))
+    backfill_rollups(db, start, end)
+
+    for day in sorted(changed_days):
+        if day < truncate(start, "day"):
+            rollup_day(db, day)
+            db.commit()
+
+    if count:
+        watermark = db.get(RollupWatermark, WATERMARK_NAME)
+        if watermark is None:
+            watermark = RollupWatermark(name=WATERMARK_NAME)
+            db.add(watermark)
+        watermark.last_order_id = max_id
+        watermark.last_order_at = _utc(last_at)
+        db.commit()
+    return count
+
+
+def purge_hourly_rollups(db: Session, retention_days: int) -> int:
+    cutoff = truncate(datetime.utcnow() - timedelta(days=retention_days), "day")
+    purged = 0
+    for model in (OrderRollup, SalesRollup):
+        purged += db.query(model).filter(
+            model.granularity == "hour", model.bucket < cutoff
+        ).delete(synchronize_session=False)
+    db.commit()
+    return purged
+
+
+def get_analytics(db: Session, start: datetime, end: datetime, granularity: str, top: int) -> dict:
+    """Revenue, orders and units over time plus product and category breakdowns, from the rollups"""
+    start = truncate(start, granularity)
+    end = _utc(end)
+
+    series = [
+        {"bucket": bucket, "orders": orders, "revenue": revenue, "units": units}
+        for bucket, orders, revenue, units in db.query(
+            OrderRollup.bucket, OrderRollup.orders, OrderRollup.revenue, OrderRollup.units
+        ).filter(
+            OrderRollup.granularity == granularity,
+            OrderRollup.bucket >= start,
+            OrderRollup.bucket < end
+        ).order_by(OrderRollup.bucket)
+    ]
+
+    in_range = (
+        SalesRollup.granularity == granularity,
+        SalesRollup.bucket >= start,
+        SalesRollup.bucket < end,
+    )
+    revenue = func.sum(SalesRollup.revenue).label("revenue")
+    top_products = (
+        db.query(
+            SalesRollup.product_id, Product.name,
+            func.sum(SalesRollup.orders), func.sum(SalesRollup.units), revenue
+        )
+        .outerjoin(Product, Product.id == SalesRollup.product_id)
+        .filter(*in_range)
+        .group_by(SalesRollup.product_id, Product.name)
+        .order_by(revenue.desc())
+        .limit(top)
+    )
+
+    # An order can hold several products of one category, so summing the
+    # per-product order counts would overstate them; categories report units
+    categories = (
+        db.query(SalesRollup.category_id, Category.name, func.sum(SalesRollup.units), revenue)
+        .outerjoin(Category, Category.id == SalesRollup.category_id)
+        .filter(*in_range)
+        .group_by(SalesRollup.category_id, Category.name)
+        .order_by(revenue.desc())
+    )
+
+    return {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "totals": {
+            "orders": sum(point["orders"] for point in series),
+            "revenue": sum(point["revenue"] for point in series),
+            "units": sum(point["units"] for point in series),
+        },
+        "series": series,
+        "top_products": [
+            {"id": product_id, "name": name, "orders": orders, "units": units, "revenue": revenue}
+            for product_id, name, orders, units, revenue in top_products
+        ],
+        "categories": [
+            {"id": category_id, "name": name, "units": units, "revenue": revenue}
+            for category_id, name, units, revenue in categories
+        ],
+    }
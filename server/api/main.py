@@ -6,9 +6,10 @@ from contextlib import asynccontextmanager
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from database import engine, Base, SessionLocal
+from database import async_engine
 from routers import (
     auth,
     products,
@@ -20,17 +21,18 @@ from routers import (
     reviews,
     hero_banners,
     about,
+    cron,
 )
 
-from models import User, UserRole
-from auth import get_password_hash
+from auth import shutdown_password_executor
 from config import settings
+from bootstrap import create_schema, seed_admin_user
 
 # ✅ Scheduler imports
 from scheduler import start_scheduler, shutdown_scheduler
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+from pagination import NEXT_CURSOR_HEADER
+from cache import start_cache_listener, stop_cache_listener
+from compression import CompressionMiddleware
 
 
 # ✅ Lifespan handler (replaces startup/shutdown events)
@@ -39,36 +41,29 @@ async def lifespan(app: FastAPI):
     """Application lifespan handler"""
 
     # 🔹 Startup logic
-    start_scheduler()
-
-    db = SessionLocal()
-    try:
-        admin_user = db.query(User).filter(
-            User.email == settings.ADMIN_EMAIL
-        ).first()
-
-        if not admin_user:
-            admin_user = User(
-                email=settings.ADMIN_EMAIL,
-                full_name="Admin User",
-                hashed_password=get_password_hash(settings.ADMIN_PASSWORD),
-                role=UserRole.ADMIN,
-                is_active=True,
-                is_verified=True,
-            )
-            db.add(admin_user)
-            db.commit()
+    # Serverless deployments turn these off and run Alembic and
+    # `python manage.py seed-admin` once per deploy instead
+    if settings.STARTUP_CREATE_SCHEMA:
+        create_schema()
+
+    if settings.STARTUP_SEED_ADMIN:
+        if seed_admin_user():
             print(f"✅ Admin user created: {settings.ADMIN_EMAIL}")
         else:
             print("ℹ️ Admin user already exists")
 
-    finally:
-        db.close()
+    if settings.STARTUP_SCHEDULER:
+        start_scheduler()
+    start_cache_listener()
 
     yield  # 🚀 Application runs here
 
     # 🔹 Shutdown logic
+    stop_cache_listener()
     shutdown_scheduler()
+    shutdown_password_executor()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 # ✅ FastAPI app with lifespan
@@ -77,8 +72,13 @@ app = FastAPI(
     description="Modern ecommerce backend with authentication and admin dashboard",
     version="1.0.1",
     lifespan=lifespan,
+    # orjson for every route that returns dicts or models
+    default_response_class=ORJSONResponse,
 )
 
+# Compression runs inside CORS, so it sees the route's response directly
+app.add_middleware(CompressionMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -90,6 +90,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],
 )
 
 # Include routers
@@ -103,6 +104,7 @@ app.include_router(handcraft_photos.router)
 app.include_router(reviews.router)
 app.include_router(hero_banners.router)
 app.include_router(about.router)
+app.include_router(cron.router)
 
 
 @app.get("/")
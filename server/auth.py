@@ -1,14 +1,19 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 from jose import JWTError, jwt
+import asyncio
 import bcrypt
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import secrets
-from database import get_db
+from database import get_async_db
 from models import User
 from config import settings
+from cache import TwoTierCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
@@ -24,6 +29,87 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+# bcrypt costs ~250 ms of CPU per call. Async routes run it on a bounded
+# executor so a burst of logins cannot freeze the event loop. bcrypt releases
+# the GIL, so threads already hash on several cores; "process" is available
+# for deployments where that is not enough.
+_password_executor: Optional[Executor] = None
+_password_stats = {
+    "in_flight": 0,
+    "completed": 0,
+    "rejected": 0,
+    "total_seconds": 0.0,
+    "max_in_flight": 0,
+}
+
+
+def _get_password_executor() -> Executor:
+    global _password_executor
+    if _password_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _password_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _password_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash"
+            )
+    return _password_executor
+
+
+async def _run_password_task(fn, *args):
+    # Shed load instead of queueing without bound during an auth spike
+    capacity = settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUE
+    if _password_stats["in_flight"] >= capacity:
+        _password_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    
+    _password_stats["in_flight"] += 1
+    _password_stats["max_in_flight"] = max(_password_stats["max_in_flight"], _password_stats["in_flight"])
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_password_executor(), fn, *args)
+    finally:
+        _password_stats["in_flight"] -= 1
+        _password_stats["completed"] += 1
+        _password_stats["total_seconds"] += time.perf_counter() - started
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_password_task(get_password_hash, password)
+
+
+def shutdown_password_executor():
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False)
+        _password_executor = None
+
+
+def password_hash_stats() -> dict:
+    """Executor load for the admin metrics endpoint"""
+    completed = _password_stats["completed"]
+    return {
+        "executor": settings.PASSWORD_HASH_EXECUTOR,
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "max_queue": settings.PASSWORD_HASH_MAX_QUEUE,
+        "in_flight": _password_stats["in_flight"],
+        "queue_depth": max(0, _password_stats["in_flight"] - settings.PASSWORD_HASH_WORKERS),
+        "max_in_flight": _password_stats["max_in_flight"],
+        "completed": completed,
+        "rejected": _password_stats["rejected"],
+        "avg_latency_ms": round(_password_stats["total_seconds"] / completed * 1000, 1) if completed else 0.0,
+    }
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -55,9 +141,26 @@ def decode_token(token: str):
         return None
 
 
+# Authenticated principals, keyed by token subject. In-process only (no L2);
+# invalidations still reach every worker over the cache pub/sub channel.
+principal_cache = TwoTierCache(
+    "principals",
+    l1_maxsize=settings.PRINCIPAL_CACHE_MAXSIZE,
+    l1_ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    l2_ttl=None,
+)
+
+_PRINCIPAL_FIELDS = ("id", "email", "full_name", "role", "is_active", "is_verified", "created_at", "updated_at")
+
+
+def invalidate_principal(email: str):
+    """Call after changing a user's role, active/verified flags or password"""
+    principal_cache.invalidate(f"user:{email}")
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -75,11 +178,21 @@ async def get_current_user(
     if email is None or token_type != "access":
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
+    principal = principal_cache.get(f"principal:{email}")
+    if principal is None:
+        result = await db.execute(
+            select(*[getattr(User, field) for field in _PRINCIPAL_FIELDS]).where(User.email == email)
+        )
+        row = result.first()
+        # Hand the pooled connection back before the route checks out its own
+        await db.rollback()
+        if row is None:
+            raise credentials_exception
+        principal = dict(row._mapping)
+        principal_cache.set(f"principal:{email}", principal, tags=[f"user:{email}"])
     
-    return user
+    # A detached copy; routes only read from the current user
+    return User(**principal)
 
 
 async def get_current_active_user(
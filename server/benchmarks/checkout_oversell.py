@@ -0,0 +1,147 @@
+"""
+Checkout oversell load test
+
+``--buyers`` threads (200 by default) released at once each place an
+order for one unit of a product that has only ``--stock`` units, through
+``checkout.place_order`` with its own session, as ``POST /api/orders``
+does. Passes when exactly ``--stock`` orders succeed, the rest are turned
+away for insufficient stock and the product ends at zero: never below.
+Exits non-zero otherwise. ``--shards`` runs it against sharded stock.
+
+Needs the database at DATABASE_URL; concurrent row locks only contend on
+Postgres. Buyers queue for pooled connections, so raise DB_POOL_SIZE and
+DB_MAX_OVERFLOW for more real concurrency. Everything it creates is
+deleted afterwards. Run from the server directory:
+
+    python benchmarks/checkout_oversell.py --buyers 200 --stock 50
+    python benchmarks/checkout_oversell.py --buyers 200 --stock 50 --shards 8
+"""
+
+import argparse
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import HTTPException
+from database import SessionLocal
+from models import EmailOutbox, Order, OrderItem, Product, ProductStockShard, User, UserRole
+from schemas import OrderCreate, OrderItemCreate
+from checkout import place_order
+from counters import reconcile_counters
+from inventory import set_shards, stock_status
+
+
+def run(user: User, product_id: int, buyers: int) -> dict:
+    results = {"ordered": 0, "short": 0, "errors": []}
+    lock = threading.Lock()
+    start = threading.Barrier(buyers)
+    order = OrderCreate(
+        shipping_address="1 Test Street",
+        shipping_city="Test",
+        shipping_postal_code="00000",
+        shipping_country="Test",
+        customer_name="Load Test",
+        customer_email="load-test@example.com",
+        items=[OrderItemCreate(product_id=product_id, quantity=1)],
+    )
+
+    def buyer():
+        start.wait()
+        db = SessionLocal()
+        try:
+            try:
+                place_order(db, user, order)
+                outcome = "ordered"
+            except HTTPException as e:
+                if e.status_code != 400:
+                    raise
+                outcome = "short"
+            with lock:
+                results[outcome] += 1
+        except Exception as e:
+            with lock:
+                results["errors"].append(repr(e))
+        finally:
+            db.close()
+
+    workers = [threading.Thread(target=buyer) for _ in range(buyers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--shards", type=int, default=0)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    tag = uuid.uuid4().hex[:12]
+    user = User(
+        email=f"load-test-{tag}@example.com", full_name="Load Test", hashed_password="!",
+        role=UserRole.CUSTOMER, is_active=True, is_verified=True
+    )
+    product = Product(
+        name="Load test product", slug=f"load-test-{tag}", price=1,
+        stock_quantity=args.stock, is_active=True
+    )
+    db.add_all([user, product])
+    db.commit()
+    if args.shards:
+        set_shards(db, product, args.shards)
+        db.commit()
+    # Shared read-only by the buyers, which only need its id
+    db.refresh(user)
+    db.expunge(user)
+
+    try:
+        started = time.perf_counter()
+        results = run(user, product.id, args.buyers)
+        elapsed = time.perf_counter() - started
+
+        db.expire_all()
+        left = stock_status(db, product)["stock_quantity"]
+        sold = db.query(OrderItem).filter(OrderItem.product_id == product.id).count()
+        print(
+            f"buyers={args.buyers} stock={args.stock} shards={args.shards}  {elapsed:.2f}s  "
+            f"ordered={results['ordered']} short={results['short']} errors={len(results['errors'])} "
+            f"order_items={sold} left={left}"
+        )
+        for error in results["errors"][:5]:
+            print(f"  {error}")
+
+        failures = []
+        if left < 0:
+            failures.append(f"stock went negative: {left}")
+        if results["ordered"] != args.stock or sold != args.stock:
+            failures.append(f"expected {args.stock} orders, got {results['ordered']} ({sold} order items)")
+        if results["errors"]:
+            failures.append(f"{len(results['errors'])} buyers failed with an unexpected error")
+    finally:
+        order_ids = [order_id for (order_id,) in db.query(Order.id).filter(Order.user_id == user.id)]
+        db.query(OrderItem).filter(OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+        db.query(Order).filter(Order.id.in_(order_ids)).delete(synchronize_session=False)
+        db.query(EmailOutbox).filter(EmailOutbox.recipient == "load-test@example.com").delete(synchronize_session=False)
+        db.query(ProductStockShard).filter(ProductStockShard.product_id == product.id).delete(synchronize_session=False)
+        db.delete(product)
+        db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+        db.commit()
+        reconcile_counters(db)
+        db.close()
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: no oversell")
+
+
+if __name__ == "__main__":
+    main()
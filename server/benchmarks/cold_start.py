@@ -0,0 +1,94 @@
+"""
+Cold-start benchmark
+
+Starts a fresh interpreter per run and measures how long it takes to
+import ``api.main``, run the lifespan startup and answer a first request,
+plus the slowest imports. Run from the server directory with the usual
+environment (.env) in place:
+
+    python benchmarks/cold_start.py --runs 5
+    python benchmarks/cold_start.py --max-import-ms 1500 --max-first-response-ms 2500
+
+Exits non-zero when a median exceeds its --max-* budget, so it can guard
+cold-start regressions in CI.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import json, time
+from fastapi.testclient import TestClient
+started = time.perf_counter()
+from api.main import app
+imported = time.perf_counter()
+with TestClient(app) as client:
+    ready = time.perf_counter()
+    status = client.get(PATH).status_code
+    responded = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_response_ms": (responded - started) * 1000,
+    "status": status,
+}))
+"""
+
+
+def run_once(path: str, env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.replace("PATH", repr(path))],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # -X importtime lines: "import time: self [us] | cumulative | name"
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        imports.append((int(self_us), name.strip()))
+    timings["slowest_imports"] = sorted(imports, reverse=True)[:10]
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure API cold-start time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/health", help="endpoint for the first request")
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-first-response-ms", type=float)
+    args = parser.parse_args(argv)
+
+    env = {**os.environ, "PYTHONPATH": str(SERVER_DIR)}
+    runs = [run_once(args.path, env) for _ in range(args.runs)]
+
+    summary = {
+        key: round(statistics.median(run[key] for run in runs), 1)
+        for key in ("import_ms", "startup_ms", "first_response_ms")
+    }
+    print(json.dumps(summary, indent=2))
+    print("Slowest imports (self time, last run):")
+    for self_us, name in runs[-1]["slowest_imports"]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if args.max_import_ms is not None and summary["import_ms"] > args.max_import_ms:
+        print(f"❌ import {summary['import_ms']} ms exceeds {args.max_import_ms} ms")
+        failed = True
+    if args.max_first_response_ms is not None and summary["first_response_ms"] > args.max_first_response_ms:
+        print(f"❌ first response {summary['first_response_ms']} ms exceeds {args.max_first_response_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Hot product benchmark for the inventory subsystem
+
+Many concurrent buyers take stock of one product, each in its own
+transaction that keeps the row lock for ``--hold-ms`` before committing
+(the rest of a checkout). Runs once per ``--shards`` value and prints the
+throughput, so plain stock (0) can be compared with sharded stock. Needs
+the database at DATABASE_URL; row locks only contend on Postgres. Run from
+the server directory:
+
+    python benchmarks/hot_product.py --threads 32 --iterations 50 --shards 0 8 16
+"""
+
+import argparse
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import SessionLocal
+from models import Product, ProductStockShard
+from inventory import set_shards, stock_status, take_stock
+
+
+def run(product_id: int, threads: int, iterations: int, hold: float) -> tuple:
+    failures = []
+
+    def buyer():
+        for _ in range(iterations):
+            db = SessionLocal()
+            try:
+                if take_stock(db, {product_id: 1}):
+                    failures.append(1)
+                    db.rollback()
+                    continue
+                time.sleep(hold)
+                db.commit()
+            finally:
+                db.close()
+
+    workers = [threading.Thread(target=buyer) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started, len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--hold-ms", type=float, default=5.0)
+    parser.add_argument("--shards", type=int, nargs="+", default=[0, 8])
+    args = parser.parse_args()
+
+    total = args.threads * args.iterations
+    db = SessionLocal()
+    product = Product(name="Benchmark hot product", slug=f"bench-{uuid.uuid4().hex[:12]}", price=1, is_active=False)
+    db.add(product)
+    db.commit()
+    try:
+        for shards in args.shards:
+            product.stock_quantity = total
+            product.stock_shards = 0
+            db.query(ProductStockShard).filter(ProductStockShard.product_id == product.id).delete()
+            set_shards(db, product, shards)
+            db.commit()
+
+            elapsed, failed = run(product.id, args.threads, args.iterations, args.hold_ms / 1000)
+            db.expire_all()
+            left = stock_status(db, product)["stock_quantity"]
+            print(f"shards={shards:<3} {total / elapsed:8.0f} takes/s  {elapsed:6.2f}s  failed={failed}  left={left}")
+    finally:
+        db.query(ProductStockShard).filter(ProductStockShard.product_id == product.id).delete()
+        db.delete(product)
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
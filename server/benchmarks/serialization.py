@@ -0,0 +1,108 @@
+"""
+Serialization benchmark for list responses
+
+Compares, per item, what FastAPI does by default for a ``response_model``
+route (validate, ``jsonable_encoder``, ``json.dumps``) with the same through
+orjson and with the precompiled TypeAdapter path in ``serialization.py``.
+No database needed; the ORM objects are built in memory. Run from the
+server directory:
+
+    python benchmarks/serialization.py --items 100 --repeat 50
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from models import Category, Product, Order, OrderItem, OrderStatus
+from schemas import ProductResponse, OrderResponse
+from serialization import PRODUCT_LIST, ORDER_LIST, to_json
+
+
+def make_products(count: int) -> list:
+    category = Category(id=1, name="Rugs", slug="rugs", description="Hand tufted", created_at=datetime.utcnow())
+    return [
+        Product(
+            id=i, name=f"Product {i}", slug=f"product-{i}", description="A tufted rug " * 10,
+            price=49.5 + i, compare_at_price=59.5 + i, stock_quantity=i % 30, sku=f"SKU-{i}",
+            image_url=f"https://example.com/{i}.jpg", images='["a.jpg", "b.jpg"]',
+            is_active=True, is_featured=i % 5 == 0, category_id=1, category=category,
+            created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def make_orders(count: int, products: list) -> list:
+    return [
+        Order(
+            id=i, order_number=f"ORD{i:07d}", user_id=1, status=OrderStatus.PENDING, total_amount=150.0,
+            shipping_address="1 Main St", shipping_city="Lahore", shipping_postal_code="54000",
+            shipping_country="PK", customer_name="Customer", customer_email="c@example.com",
+            created_at=datetime.utcnow(),
+            order_items=[
+                OrderItem(id=i * 10 + n, product=products[(i + n) % len(products)], quantity=1, price=50.0)
+                for n in range(3)
+            ]
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def fastapi_default(schema, items) -> bytes:
+    # What serialize_response + JSONResponse.render do for response_model=List[schema]
+    validated = TypeAdapter(List[schema]).validate_python(items, from_attributes=True)
+    return json.dumps(
+        jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def fastapi_orjson(schema, items) -> bytes:
+    validated = TypeAdapter(List[schema]).validate_python(items, from_attributes=True)
+    return orjson.dumps(jsonable_encoder(validated))
+
+
+def timed(fn, repeat: int) -> float:
+    fn()  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure list response serialization cost")
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    products = make_products(args.items)
+    orders = make_orders(args.items, products)
+    cases = [
+        ("List[ProductResponse]", ProductResponse, PRODUCT_LIST, products),
+        ("List[OrderResponse] (3 items each)", OrderResponse, ORDER_LIST, orders),
+    ]
+
+    for label, schema, adapter, items in cases:
+        assert json.loads(fastapi_default(schema, items)) == json.loads(to_json(adapter, items))
+        print(f"{label}, {args.items} per response (µs per item):")
+        for name, fn in (
+            ("fastapi default", lambda: fastapi_default(schema, items)),
+            ("jsonable_encoder + orjson", lambda: fastapi_orjson(schema, items)),
+            ("TypeAdapter.dump_json", lambda: to_json(adapter, items)),
+        ):
+            per_item = timed(fn, args.repeat) / len(items) * 1_000_000
+            print(f"  {name:28} {per_item:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
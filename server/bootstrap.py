@@ -0,0 +1,52 @@
+"""
+One-off setup tasks
+
+Run from ``manage.py`` in production (schema by Alembic, admin seeded once
+per deployment) or from the app lifespan when the STARTUP_* flags ask for
+it, as in local development.
+"""
+
+from database import engine, Base, SessionLocal
+from models import User, UserRole, Product
+# Registers the after_create listener that builds the search index
+from search import install_search_index, search_index_installed
+from auth import get_password_hash
+from config import settings
+
+
+def create_schema():
+    """Create any missing tables; Alembic is the source of truth in production"""
+    Base.metadata.create_all(bind=engine)
+
+    # A products table created without the listener has no search objects yet
+    with engine.begin() as connection:
+        if not search_index_installed(connection):
+            install_search_index(Product.__table__, connection)
+        if not search_index_installed(connection):
+            raise RuntimeError("Product search index is missing after creating the schema")
+
+
+def seed_admin_user() -> bool:
+    """Create the ADMIN_EMAIL user if it does not exist; returns True if created"""
+    db = SessionLocal()
+    try:
+        admin_user = db.query(User).filter(
+            User.email == settings.ADMIN_EMAIL
+        ).first()
+
+        if admin_user:
+            return False
+
+        admin_user = User(
+            email=settings.ADMIN_EMAIL,
+            full_name="Admin User",
+            hashed_password=get_password_hash(settings.ADMIN_PASSWORD),
+            role=UserRole.ADMIN,
+            is_active=True,
+            is_verified=True,
+        )
+        db.add(admin_user)
+        db.commit()
+        return True
+    finally:
+        db.close()
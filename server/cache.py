@@ -0,0 +1,325 @@
+"""
+Two-tier read-through cache for public catalog reads
+
+L1 is a small in-process LRU with a TTL, L2 is the shared Redis at
+``REDIS_URL``. Entries carry tags; writes invalidate by tag in both tiers
+and publish the tags so every other worker drops its L1 copies too. When
+Redis is unreachable the cache keeps working as L1 only.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+from urllib.parse import urlencode
+import redis
+from config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Identifies this process so it can skip its own invalidation messages
+WORKER_ID = uuid.uuid4().hex
+
+_MISSING = object()
+
+_redis_client: Optional[redis.Redis] = None
+_redis_retry_at = 0.0
+_redis_lock = threading.Lock()
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """Shared Redis client, or None while Redis is disabled or unreachable"""
+    global _redis_client, _redis_retry_at
+
+    if not settings.CACHE_REDIS_ENABLED:
+        return None
+    if _redis_client is not None:
+        return _redis_client
+    if time.monotonic() < _redis_retry_at:
+        return None
+
+    with _redis_lock:
+        if _redis_client is None and time.monotonic() >= _redis_retry_at:
+            try:
+                client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    socket_timeout=settings.CACHE_REDIS_TIMEOUT_SECONDS,
+                    socket_connect_timeout=settings.CACHE_REDIS_TIMEOUT_SECONDS,
+                )
+                client.ping()
+                _redis_client = client
+            except (redis.RedisError, OSError) as e:
+                logger.warning(f"Redis unavailable, using in-process cache only: {str(e)}")
+                _redis_retry_at = time.monotonic() + settings.CACHE_REDIS_RETRY_SECONDS
+    return _redis_client
+
+
+def _redis_failed(e: Exception):
+    """Drop the client after an error so the next call backs off instead of hanging"""
+    global _redis_client, _redis_retry_at
+    logger.warning(f"Redis cache error: {str(e)}")
+    _redis_client = None
+    _redis_retry_at = time.monotonic() + settings.CACHE_REDIS_RETRY_SECONDS
+
+
+def make_key(prefix: str, **params) -> str:
+    """Stable cache key from a prefix and the request parameters"""
+    items = sorted((k, v) for k, v in params.items() if v is not None)
+    return f"{prefix}?{urlencode(items)}" if items else prefix
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and a tag index"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tags: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None):
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_tags(self, tags: Iterable[str]):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class TwoTierCache:
+    """L1 TTLCache in front of Redis, with tag invalidation fanned out over pub/sub"""
+
+    def __init__(
+        self,
+        namespace: str,
+        l1_maxsize: int,
+        l1_ttl: float,
+        l2_ttl: Optional[int],
+        version: int = 1
+    ):
+        self.namespace = namespace
+        # Bump when the cached value format changes so a rolling deploy
+        # never reads entries written by the previous release
+        self.version = version
+        self.l1 = TTLCache(l1_maxsize, l1_ttl)
+        # l2_ttl=None keeps the cache in-process; invalidations still fan out
+        self.l2_ttl = l2_ttl
+        self.hits_l1 = 0
+        self.hits_l2 = 0
+        self.misses = 0
+        _caches[namespace] = self
+
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.namespace}:v{self.version}:{key}"
+
+    def _redis_tag(self, tag: str) -> str:
+        return f"cache:{self.namespace}:v{self.version}:tag:{tag}"
+
+    def get(self, key: str) -> Any:
+        if not settings.CACHE_ENABLED:
+            return None
+
+        value = self.l1.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits_l1 += 1
+            return value
+
+        client = get_redis() if self.l2_ttl else None
+        if client is not None:
+            try:
+                raw = client.get(self._redis_key(key))
+            except (redis.RedisError, OSError) as e:
+                _redis_failed(e)
+                raw = None
+            if raw is not None:
+                entry = json.loads(raw)
+                self.l1.set(key, entry["value"], entry["tags"])
+                self.hits_l2 += 1
+                return entry["value"]
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = ()):
+        if not settings.CACHE_ENABLED:
+            return
+
+        tags = tuple(tags)
+        self.l1.set(key, value, tags)
+
+        client = get_redis() if self.l2_ttl else None
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            # Tags travel with the value so L1 copies filled from L2 stay invalidatable
+            entry = json.dumps({"value": value, "tags": tags}, separators=(",", ":"))
+            pipe.set(self._redis_key(key), entry, ex=self.l2_ttl)
+            for tag in tags:
+                pipe.sadd(self._redis_tag(tag), key)
+                pipe.expire(self._redis_tag(tag), self.l2_ttl)
+            pipe.execute()
+        except (redis.RedisError, OSError) as e:
+            _redis_failed(e)
+
+    def invalidate(self, *tags: str):
+        """Drop every entry carrying one of ``tags``, here, in Redis and on all other workers"""
+        if not tags:
+            return
+
+        self.l1.invalidate_tags(tags)
+
+        client = get_redis()
+        if client is None:
+            return
+        try:
+            if self.l2_ttl:
+                tag_keys = [self._redis_tag(tag) for tag in tags]
+                pipe = client.pipeline(transaction=False)
+                for tag_key in tag_keys:
+                    pipe.smembers(tag_key)
+                members = pipe.execute()
+                keys = {self._redis_key(k.decode("utf-8")) for group in members for k in group}
+                if keys or tag_keys:
+                    client.delete(*keys, *tag_keys)
+            client.publish(INVALIDATION_CHANNEL, json.dumps({
+                "origin": WORKER_ID,
+                "namespace": self.namespace,
+                "tags": list(tags),
+            }))
+        except (redis.RedisError, OSError) as e:
+            _redis_failed(e)
+
+    def stats(self) -> dict:
+        return {
+            "l1_entries": len(self.l1),
+            "hits_l1": self.hits_l1,
+            "hits_l2": self.hits_l2,
+            "misses": self.misses,
+        }
+
+
+_caches: dict = {}
+
+catalog_cache = TwoTierCache(
+    "catalog",
+    l1_maxsize=settings.CACHE_L1_MAXSIZE,
+    l1_ttl=settings.CACHE_L1_TTL_SECONDS,
+    l2_ttl=settings.CACHE_L2_TTL_SECONDS,
+    # v3: pre-serialized JSON bodies with their HTTP validators
+    version=3,
+)
+
+
+# Pub/sub listener
+
+_listener_thread: Optional[threading.Thread] = None
+_listener_stop = threading.Event()
+
+
+def _handle_invalidation(raw: bytes):
+    try:
+        message = json.loads(raw)
+    except ValueError:
+        return
+    if message.get("origin") == WORKER_ID:
+        return
+    cache = _caches.get(message.get("namespace"))
+    if cache is not None:
+        cache.l1.invalidate_tags(message.get("tags") or ())
+
+
+def _listen():
+    while not _listener_stop.is_set():
+        client = get_redis()
+        if client is None:
+            _listener_stop.wait(settings.CACHE_REDIS_RETRY_SECONDS)
+            continue
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            while not _listener_stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message and message.get("type") == "message":
+                    _handle_invalidation(message["data"])
+        except (redis.RedisError, OSError) as e:
+            _redis_failed(e)
+            # Anything published while we were disconnected is lost
+            for cache in _caches.values():
+                cache.l1.clear()
+        finally:
+            try:
+                pubsub.close()
+            except (redis.RedisError, OSError):
+                pass
+
+
+def start_cache_listener():
+    """Subscribe to invalidations from other workers"""
+    global _listener_thread
+    if not settings.CACHE_ENABLED or not settings.CACHE_REDIS_ENABLED:
+        return
+    if _listener_thread is not None and _listener_thread.is_alive():
+        return
+    _listener_stop.clear()
+    _listener_thread = threading.Thread(target=_listen, name="cache-invalidation", daemon=True)
+    _listener_thread.start()
+
+
+def stop_cache_listener():
+    global _listener_thread
+    _listener_stop.set()
+    if _listener_thread is not None:
+        _listener_thread.join(timeout=2)
+        _listener_thread = None
@@ -0,0 +1,351 @@
+"""
+Cart storage
+
+CART_STORE picks where carts live. "sql" (the default) keeps them as
+``cart_items`` rows. "redis" keeps one hash per user, ``cart:{user_id}``,
+mapping product id to quantity and time added, in the Redis at REDIS_URL:
+editing a cart then never writes to the primary database, and a cart only
+reaches SQL as the order placed from it. Redis carts expire
+CART_REDIS_TTL_SECONDS after their last change, and their line ids are
+product ids.
+
+Both stores return lines shaped like ``CartItem`` (id, product_id,
+quantity, created_at, product) and touch SQL only inside the caller's
+transaction. Redis writes apply at once, so a Redis failure surfaces before
+the transaction commits and rolls it back, and each write is undone if the
+transaction rolls back instead of committing (say, a failed commit). Each
+line keeps its quantity in its own hash field, ``{product_id}``, next to
+``{product_id}:added``, so adding to a line is one HINCRBY, concurrent adds
+both count, and undoing an add takes back only that add.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import redis
+from fastapi import HTTPException, status
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session, joinedload
+from models import CartItem, Product
+from loaders import cart_item_options
+from cache import get_redis
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Session.info keys: carts cleared once the transaction commits, and undo
+# steps for the Redis writes made during it, run if it rolls back
+_CLEAR_ON_COMMIT = "cart_store_clear_on_commit"
+_UNDO_ON_ROLLBACK = "cart_store_undo_on_rollback"
+
+# Hash field suffix for the time a line was added
+_ADDED = ":added"
+
+# Take back an add; a line left with nothing is removed
+_UNDO_ADD_SCRIPT = """
+local quantity = redis.call("HINCRBY", KEYS[1], ARGV[1], -tonumber(ARGV[2]))
+if quantity <= 0 then
+    redis.call("HDEL", KEYS[1], ARGV[1], ARGV[1] .. ":added")
+end
+return quantity
+"""
+
+
+class CartLine:
+    """A cart line kept outside SQL"""
+
+    def __init__(self, product_id: int, quantity: int, created_at: datetime, product: Optional[Product] = None):
+        self.id = product_id
+        self.product_id = product_id
+        self.quantity = quantity
+        self.created_at = created_at
+        self.product = product
+
+
+class SQLCartStore:
+    def lines(self, db: Session, user_id: int) -> list:
+        return db.query(CartItem).options(*cart_item_options()).filter(
+            CartItem.user_id == user_id
+        ).order_by(CartItem.id).all()
+
+    def line(self, db: Session, user_id: int, line_id: int):
+        return db.query(CartItem).options(*cart_item_options()).filter(
+            CartItem.id == line_id,
+            CartItem.user_id == user_id
+        ).first()
+
+    def quantities(self, db: Session, user_id: int) -> Dict[int, int]:
+        quantities = {}
+        for product_id, quantity in db.query(CartItem.product_id, CartItem.quantity).filter(
+            CartItem.user_id == user_id
+        ):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        return quantities
+
+    def _product_items(self, db: Session, user_id: int, product_id: int):
+        return db.query(CartItem).filter(
+            CartItem.user_id == user_id,
+            CartItem.product_id == product_id
+        ).order_by(CartItem.id)
+
+    def set_quantity(self, db: Session, user_id: int, product_id: int, quantity: int):
+        """Set the product's line to ``quantity`` (0 removes it); returns the line"""
+        return self._set(db, user_id, product_id, self._product_items(db, user_id, product_id).all(), quantity)
+
+    def add_quantity(self, db: Session, user_id: int, product_id: int, quantity: int):
+        """Add ``quantity`` to the product's line; returns the line"""
+        # Locked, so concurrent adds to an existing line both count
+        items = self._product_items(db, user_id, product_id).with_for_update().all()
+        return self._set(db, user_id, product_id, items, sum(item.quantity for item in items) + quantity)
+
+    def _set(self, db: Session, user_id: int, product_id: int, items: list, quantity: int):
+        # Extra rows for one product are merged away
+        for item in items[1:] if quantity else items:
+            db.delete(item)
+        if not quantity:
+            db.flush()
+            return None
+
+        if items:
+            item = items[0]
+            item.quantity = quantity
+        else:
+            item = CartItem(user_id=user_id, product_id=product_id, quantity=quantity)
+            db.add(item)
+        db.flush()
+        return item
+
+    def replace(self, db: Session, user_id: int, quantities: Dict[int, int]):
+        """Make the cart ``{product_id: quantity}`` with at most one statement of each kind"""
+        current = {}
+        to_delete = []
+        for cart_item_id, product_id, quantity in db.query(
+            CartItem.id, CartItem.product_id, CartItem.quantity
+        ).filter(CartItem.user_id == user_id).order_by(CartItem.id):
+            if product_id in current or product_id not in quantities:
+                to_delete.append(cart_item_id)
+            else:
+                current[product_id] = (cart_item_id, quantity)
+
+        to_update = [
+            {"id": cart_item_id, "quantity": quantities[product_id]}
+            for product_id, (cart_item_id, quantity) in current.items()
+            if quantity != quantities[product_id]
+        ]
+        to_insert = [
+            {"user_id": user_id, "product_id": product_id, "quantity": quantity}
+            for product_id, quantity in quantities.items()
+            if product_id not in current
+        ]
+
+        if to_delete:
+            db.query(CartItem).filter(CartItem.id.in_(to_delete)).delete(synchronize_session=False)
+        if to_update:
+            db.execute(update(CartItem), to_update)
+        if to_insert:
+            db.execute(insert(CartItem), to_insert)
+
+    def clear(self, db: Session, user_id: int):
+        db.query(CartItem).filter(CartItem.user_id == user_id).delete(synchronize_session=False)
+
+    def clear_on_commit(self, db: Session, user_id: int):
+        """Empty the cart as part of the caller's transaction"""
+        self.clear(db, user_id)
+
+
+class RedisCartStore:
+    def _client(self) -> redis.Redis:
+        client = get_redis()
+        if client is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Cart is temporarily unavailable"
+            )
+        return client
+
+    def _key(self, user_id: int) -> str:
+        return f"cart:{user_id}"
+
+    def _unavailable(self, e: Exception) -> HTTPException:
+        logger.warning(f"Redis cart error: {str(e)}")
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Cart is temporarily unavailable"
+        )
+
+    def _entries(self, user_id: int) -> Dict[int, Tuple[int, datetime]]:
+        """``{product_id: (quantity, created_at)}``"""
+        try:
+            raw = self._client().hgetall(self._key(user_id))
+        except (redis.RedisError, OSError) as e:
+            raise self._unavailable(e)
+
+        quantities = {}
+        added = {}
+        for field, value in raw.items():
+            field = field.decode()
+            if field.endswith(_ADDED):
+                added[int(field[:-len(_ADDED)])] = datetime.fromisoformat(value.decode())
+            else:
+                quantities[int(field)] = int(value)
+        return {product_id: (quantity, added[product_id]) for product_id, quantity in quantities.items()}
+
+    def _pipeline(self, user_id: int, build) -> list:
+        """Run the commands ``build(pipe, key)`` queues as one MULTI/EXEC"""
+        try:
+            pipe = self._client().pipeline(transaction=True)
+            build(pipe, self._key(user_id))
+            return pipe.execute()
+        except (redis.RedisError, OSError) as e:
+            raise self._unavailable(e)
+
+    def _undo_on_rollback(self, db: Session, user_id: int, undo):
+        # Without a transaction a failed commit or close ends nothing and the
+        # undo would never run; begin() checks out no connection
+        if not db.in_transaction():
+            db.begin()
+        db.info.setdefault(_UNDO_ON_ROLLBACK, []).append((user_id, undo))
+
+    def _write(self, db: Session, user_id: int, build) -> list:
+        """Run ``build``'s commands now; the whole cart is restored if the transaction rolls back"""
+        snapshot, *results = self._pipeline(user_id, lambda pipe, key: (pipe.hgetall(key), build(pipe, key)))
+
+        def restore(pipe, key):
+            pipe.delete(key)
+            if snapshot:
+                pipe.hset(key, mapping=snapshot)
+                pipe.expire(key, settings.CART_REDIS_TTL_SECONDS)
+
+        self._undo_on_rollback(db, user_id, lambda: self._pipeline(user_id, restore))
+        return results
+
+    def _lines(self, db: Session, entries: Dict[int, Tuple[int, datetime]]) -> List[CartLine]:
+        """Lines with their products, from one query; lines of deleted products are dropped"""
+        if not entries:
+            return []
+        products = {
+            product.id: product
+            for product in db.query(Product).options(joinedload(Product.category)).filter(
+                Product.id.in_(list(entries))
+            )
+        }
+        lines = [
+            CartLine(product_id, quantity, created_at, products[product_id])
+            for product_id, (quantity, created_at) in entries.items()
+            if product_id in products
+        ]
+        lines.sort(key=lambda line: line.created_at)
+        return lines
+
+    def lines(self, db: Session, user_id: int) -> List[CartLine]:
+        return self._lines(db, self._entries(user_id))
+
+    def line(self, db: Session, user_id: int, line_id: int) -> Optional[CartLine]:
+        try:
+            quantity, added = self._client().hmget(self._key(user_id), str(line_id), f"{line_id}{_ADDED}")
+        except (redis.RedisError, OSError) as e:
+            raise self._unavailable(e)
+        if quantity is None:
+            return None
+        lines = self._lines(db, {line_id: (int(quantity), datetime.fromisoformat(added.decode()))})
+        return lines[0] if lines else None
+
+    def quantities(self, db: Session, user_id: int) -> Dict[int, int]:
+        return {product_id: quantity for product_id, (quantity, _) in self._entries(user_id).items()}
+
+    def set_quantity(self, db: Session, user_id: int, product_id: int, quantity: int) -> Optional[CartLine]:
+        if not quantity:
+            self._write(db, user_id, lambda pipe, key: pipe.hdel(key, str(product_id), f"{product_id}{_ADDED}"))
+            return None
+
+        now = datetime.now(timezone.utc).isoformat()
+
+        def build(pipe, key):
+            pipe.hset(key, str(product_id), quantity)
+            pipe.hsetnx(key, f"{product_id}{_ADDED}", now)
+            pipe.hget(key, f"{product_id}{_ADDED}")
+            pipe.expire(key, settings.CART_REDIS_TTL_SECONDS)
+
+        added = self._write(db, user_id, build)[2]
+        return self._lines(db, {product_id: (quantity, datetime.fromisoformat(added.decode()))})[0]
+
+    def add_quantity(self, db: Session, user_id: int, product_id: int, quantity: int) -> CartLine:
+        now = datetime.now(timezone.utc).isoformat()
+
+        def build(pipe, key):
+            pipe.hincrby(key, str(product_id), quantity)
+            pipe.hsetnx(key, f"{product_id}{_ADDED}", now)
+            pipe.hget(key, f"{product_id}{_ADDED}")
+            pipe.expire(key, settings.CART_REDIS_TTL_SECONDS)
+
+        total, _, added, _ = self._pipeline(user_id, build)
+        # Only this add is taken back, so a concurrent add still counts
+        self._undo_on_rollback(db, user_id, lambda: self._client().eval(
+            _UNDO_ADD_SCRIPT, 1, self._key(user_id), str(product_id), quantity
+        ))
+        return self._lines(db, {product_id: (int(total), datetime.fromisoformat(added.decode()))})[0]
+
+    def replace(self, db: Session, user_id: int, quantities: Dict[int, int]):
+        added = {product_id: created_at for product_id, (_, created_at) in self._entries(user_id).items()}
+        now = datetime.now(timezone.utc)
+        mapping = {}
+        for product_id, quantity in quantities.items():
+            mapping[str(product_id)] = quantity
+            mapping[f"{product_id}{_ADDED}"] = added.get(product_id, now).isoformat()
+
+        def build(pipe, key):
+            pipe.delete(key)
+            if mapping:
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, settings.CART_REDIS_TTL_SECONDS)
+
+        self._write(db, user_id, build)
+
+    def clear(self, db: Session, user_id: int):
+        self._write(db, user_id, lambda pipe, key: pipe.delete(key))
+
+    def clear_on_commit(self, db: Session, user_id: int):
+        """Empty the cart once the caller's transaction commits; a rollback keeps it"""
+        db.info.setdefault(_CLEAR_ON_COMMIT, []).append(user_id)
+
+    def clear_committed(self, user_ids: List[int]):
+        try:
+            self._client().delete(*[self._key(user_id) for user_id in user_ids])
+        except (HTTPException, redis.RedisError, OSError) as e:
+            # The orders stand; their users are left with stale carts
+            logger.warning(f"Could not clear the carts of users {user_ids}: {str(e)}")
+
+    def undo(self, steps: list):
+        for user_id, undo in reversed(steps):
+            try:
+                undo()
+            except (HTTPException, redis.RedisError, OSError) as e:
+                logger.warning(f"Could not undo a rolled back change to the cart of user {user_id}: {str(e)}")
+
+
+_STORES = {
+    "sql": SQLCartStore(),
+    "redis": RedisCartStore(),
+}
+
+
+def get_cart_store():
+    return _STORES[settings.CART_STORE]
+
+
+@event.listens_for(Session, "after_commit")
+def _clear_committed_carts(session):
+    session.info.pop(_UNDO_ON_ROLLBACK, None)
+    user_ids = session.info.pop(_CLEAR_ON_COMMIT, None)
+    if user_ids:
+        _STORES["redis"].clear_committed(user_ids)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _undo_rolled_back_carts(session, transaction):
+    # Still queued at the end of the outermost transaction: it rolled back
+    if transaction.parent is None:
+        session.info.pop(_CLEAR_ON_COMMIT, None)
+        steps = session.info.pop(_UNDO_ON_ROLLBACK, None)
+        if steps:
+            _STORES["redis"].undo(steps)
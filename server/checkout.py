@@ -0,0 +1,175 @@
+"""
+Checkout engine
+
+Places an order in a fixed number of round trips regardless of how many
+items it has, and never oversells: stock comes from the user's
+reservations or is taken with one conditional UPDATE (see inventory), and
+order items are inserted in one batch. Stock is taken last, right before
+the commit, so locks on popular products are held as briefly as possible.
+"""
+
+from collections import OrderedDict
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from models import Order, OrderItem, Product, User, OrderStatus, StockReservation
+from schemas import OrderCreate
+from loaders import order_detail_options
+from email_service import enqueue_email
+from counters import update_counters
+from inventory import consume_reservations, move_stock, reservation_mode, set_reservations
+from cart_store import get_cart_store
+import random
+import string
+
+
+def generate_order_number():
+    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
+
+
+def _requested_quantities(order_data: OrderCreate) -> "OrderedDict[int, int]":
+    # The same product listed twice is one line with the summed quantity
+    quantities = OrderedDict()
+    for item in order_data.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return quantities
+
+
+def place_order(db: Session, user: User, order_data: OrderCreate) -> Order:
+    """Validate, take stock for and persist an order, then clear the user's cart.
+
+    Raises HTTPException (and rolls back) when a product is missing, inactive
+    or out of stock. The confirmation email is queued in the same
+    transaction. Returns the committed order with its items loaded.
+    """
+    if not order_data.items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Order must contain at least one item"
+        )
+
+    quantities = _requested_quantities(order_data)
+
+    # One SELECT for every product. No row locks: stock is taken at the end
+    products = {
+        product.id: product
+        for product in db.query(Product).filter(Product.id.in_(list(quantities)))
+    }
+
+    total_amount = 0
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+
+        if not product:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with id {product_id} not found"
+            )
+
+        if not product.is_active:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Product {product.name} is not available"
+            )
+
+        total_amount += product.price * quantity
+
+    new_order = Order(
+        order_number=generate_order_number(),
+        user_id=user.id,
+        status=OrderStatus.PENDING,
+        total_amount=total_amount,
+        shipping_address=order_data.shipping_address,
+        shipping_city=order_data.shipping_city,
+        shipping_postal_code=order_data.shipping_postal_code,
+        shipping_country=order_data.shipping_country,
+        customer_name=order_data.customer_name,
+        customer_email=order_data.customer_email,
+        customer_phone=order_data.customer_phone,
+        notes=order_data.notes
+    )
+    db.add(new_order)
+    db.flush()
+
+    db.execute(insert(OrderItem), [
+        {
+            "order_id": new_order.id,
+            "product_id": product_id,
+            "quantity": quantity,
+            "price": products[product_id].price,
+        }
+        for product_id, quantity in quantities.items()
+    ])
+
+    # Clear user's cart; a Redis cart only once the order is committed
+    get_cart_store().clear_on_commit(db, user.id)
+
+    enqueue_email(
+        db, "order_confirmation", new_order.customer_email,
+        order_number=new_order.order_number,
+        total_amount=new_order.total_amount
+    )
+
+    # Reserved units are already out of stock: only the rest is taken, and
+    # unused reservations go back, in the same id-ordered pass
+    short = move_stock(db, consume_reservations(db, user.id, quantities))
+    if short:
+        db.rollback()
+        if len(short) == 1:
+            detail = f"Insufficient stock for product {products[short[0]].name}"
+        else:
+            detail = "Insufficient stock for one or more products"
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail
+        )
+
+    update_counters(db, total_orders=1, total_revenue=total_amount, pending_orders=1)
+    db.commit()
+
+    return db.query(Order).options(*order_detail_options()).filter(Order.id == new_order.id).first()
+
+
+def start_checkout(db: Session, user: User) -> dict:
+    """Reserve everything in the user's cart for STOCK_RESERVATION_TTL_SECONDS.
+
+    Calling it again re-reserves the current cart and restarts the TTL.
+    """
+    if reservation_mode() == "off":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Stock reservations are disabled"
+        )
+
+    quantities = get_cart_store().quantities(db, user.id)
+    if not quantities:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cart is empty"
+        )
+
+    short = set_reservations(db, user.id, quantities, replace=True)
+    if short:
+        db.rollback()
+        names = [name for (name,) in db.query(Product.name).filter(Product.id.in_(short)).order_by(Product.id)]
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Insufficient stock for {', '.join(names) or 'one or more products'}"
+        )
+
+    reservations = (
+        db.query(StockReservation)
+        .filter(StockReservation.user_id == user.id)
+        .order_by(StockReservation.product_id)
+        .all()
+    )
+    db.commit()
+    return {
+        "expires_at": min(reservation.expires_at for reservation in reservations),
+        "items": [
+            {"product_id": reservation.product_id, "quantity": reservation.quantity}
+            for reservation in reservations
+        ],
+    }
@@ -5,6 +5,20 @@ from typing import Optional
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    # Async routes use asyncpg/aiosqlite when enabled, the threadpool otherwise
+    DB_ASYNC: bool = False
+    # Defaults to DATABASE_URL with its async driver
+    ASYNC_DATABASE_URL: Optional[str] = None
+    
+    # Connection pool
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Serverless: no pool in the process, one connection per checkout through an
+    # external pooler (PgBouncer, Supabase/Neon pooled URL) in transaction mode
+    DB_SERVERLESS: bool = False
     
     # JWT
     SECRET_KEY: str
@@ -12,6 +26,15 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     
+    # Password hashing executor ("thread" or "process")
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+    
+    # Authenticated principal cache
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30
+    PRINCIPAL_CACHE_MAXSIZE: int = 10000
+    
     # Email
     MAIL_USERNAME: str
     MAIL_PASSWORD: str
@@ -19,6 +42,27 @@ class Settings(BaseSettings):
     MAIL_PORT: int = 587
     MAIL_SERVER: str
     MAIL_FROM_NAME: str = "Noosh Tuft"
+    MAIL_STARTTLS: bool = True
+    MAIL_SSL_TLS: bool = False
+    MAIL_USE_CREDENTIALS: bool = True
+    MAIL_TIMEOUT_SECONDS: float = 30
+    
+    # Email outbox worker
+    OUTBOX_POLL_SECONDS: int = 10
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_MAX_BATCHES_PER_RUN: int = 20
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_BASE_SECONDS: int = 30
+    OUTBOX_RETENTION_DAYS: int = 7
+    
+    # Startup: turn off on serverless, where every cold start pays for them
+    STARTUP_CREATE_SCHEMA: bool = True
+    STARTUP_SEED_ADMIN: bool = True
+    STARTUP_SCHEDULER: bool = True
+    # Without the scheduler, cron runs the jobs: GET /api/cron/jobs with
+    # "Authorization: Bearer <CRON_SECRET>" (off while unset) or
+    # "python manage.py run-jobs"
+    CRON_SECRET: Optional[str] = None
     
     # Frontend
     FRONTEND_URL: str 
@@ -30,6 +74,70 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
     
+    # Cache
+    CACHE_ENABLED: bool = True
+    CACHE_REDIS_ENABLED: bool = True
+    CACHE_L1_MAXSIZE: int = 1024
+    CACHE_L1_TTL_SECONDS: float = 30
+    CACHE_L2_TTL_SECONDS: int = 300
+    CACHE_REDIS_TIMEOUT_SECONDS: float = 0.5
+    CACHE_REDIS_RETRY_SECONDS: float = 30
+    
+    # HTTP caching: Cache-Control sent with the public read endpoints
+    HTTP_CACHE_PRODUCTS: str = "public, max-age=60, stale-while-revalidate=300"
+    HTTP_CACHE_CATEGORIES: str = "public, max-age=300, stale-while-revalidate=3600"
+    # Hero banners, about page and handcraft photos
+    HTTP_CACHE_CONTENT: str = "public, max-age=300, stale-while-revalidate=3600"
+    
+    # Response compression (brotli when the package is installed, else gzip)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    
+    # Scheduler leases: "auto" (Postgres advisory locks on Postgres, none
+    # elsewhere), "postgres", "redis" or "none"
+    SCHEDULER_LOCK_BACKEND: str = "auto"
+    SCHEDULER_LEASE_TTL_SECONDS: float = 60
+    
+    # Unverified user cleanup
+    CLEANUP_BATCH_SIZE: int = 1000
+    CLEANUP_PAUSE_SECONDS: float = 0.5
+    
+    # Dashboard counters: how often pending deltas are folded into the totals
+    STAT_COUNTER_FOLD_SECONDS: int = 60
+    STAT_COUNTER_FOLD_BATCH_SIZE: int = 5000
+    
+    # Sales analytics rollups
+    ANALYTICS_ROLLUP_MINUTES: int = 5
+    ANALYTICS_HOURLY_RETENTION_DAYS: int = 90
+    # Recomputed every run: orders created or changed (status, amount) within it
+    ANALYTICS_RECOMPUTE_HOURS: int = 24
+    # Longest range POST /api/admin/analytics/backfill accepts
+    ANALYTICS_BACKFILL_MAX_DAYS: int = 31
+    
+    # Inventory: "off" checks stock in the cart and takes it when the order
+    # is placed, "cart" reserves it on add to cart, "checkout" when checkout
+    # starts (POST /api/orders/reserve)
+    STOCK_RESERVATION_MODE: str = "off"
+    STOCK_RESERVATION_TTL_SECONDS: int = 900
+    STOCK_RELEASE_SECONDS: int = 60
+    STOCK_RELEASE_BATCH_SIZE: int = 500
+    
+    # Cart storage: "sql" (cart_items rows) or "redis" (a hash per user in
+    # the Redis at REDIS_URL; needs CACHE_REDIS_ENABLED)
+    CART_STORE: str = "sql"
+    CART_REDIS_TTL_SECONDS: int = 30 * 24 * 3600
+    
+    # Bulk product import: rows per upsert batch and commit
+    PRODUCT_IMPORT_BATCH_SIZE: int = 500
+    
+    # Admin exports: rows fetched per server-side cursor round trip
+    EXPORT_BATCH_SIZE: int = 1000
+    
+    # Search
+    SEARCH_LANGUAGE: str = "english"
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,172 @@
+"""
+Admin dashboard counters
+
+``stat_counters`` holds one base row per dashboard total so the dashboard
+reads them without aggregating ``orders``, ``products`` and ``users`` on
+every load. The order, product and user write paths append their deltas to
+``stat_counter_deltas`` in their own transaction: an INSERT never waits on
+another checkout, where incrementing a shared row would serialize every
+order on its lock. A total is its base row plus its pending deltas;
+``fold_counter_deltas`` moves deltas into the base rows in the background.
+
+``reconcile_counters`` recomputes everything and corrects drift with one
+more delta row. The recomputed values and the current totals come from a
+single statement, so they see the same snapshot and no lock is needed.
+"""
+
+from sqlalchemy import case, func, insert, literal, select, true, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import StatCounter, StatCounterDelta, Order, OrderStatus, Product, User, UserRole
+
+TOTAL_ORDERS = "total_orders"
+TOTAL_REVENUE = "total_revenue"
+PENDING_ORDERS = "pending_orders"
+TOTAL_PRODUCTS = "total_products"
+TOTAL_CUSTOMERS = "total_customers"
+
+COUNTER_NAMES = (TOTAL_ORDERS, TOTAL_REVENUE, PENDING_ORDERS, TOTAL_PRODUCTS, TOTAL_CUSTOMERS)
+
+LOW_STOCK_THRESHOLD = 10
+
+
+def _computed():
+    """Subqueries computing every dashboard total, plus the live low-stock count"""
+    orders = select(
+        func.count(Order.id).label(TOTAL_ORDERS),
+        func.coalesce(func.sum(Order.total_amount), 0).label(TOTAL_REVENUE),
+        func.coalesce(func.sum(case((Order.status == OrderStatus.PENDING, 1), else_=0)), 0).label(PENDING_ORDERS),
+    ).subquery()
+    products = select(
+        func.count(Product.id).label(TOTAL_PRODUCTS),
+        func.coalesce(
+            func.sum(case((Product.stock_quantity < LOW_STOCK_THRESHOLD, 1), else_=0)), 0
+        ).label("low_stock_products"),
+    ).subquery()
+    customers = select(
+        func.count(User.id).label(TOTAL_CUSTOMERS)
+    ).where(User.role == UserRole.CUSTOMER).subquery()
+    return orders, products, customers
+
+
+def _counted():
+    """Base value plus pending deltas, and the number of base rows, per counter"""
+    entries = union_all(
+        select(StatCounter.name, StatCounter.value, literal(1).label("base")),
+        select(StatCounterDelta.name, StatCounterDelta.delta, literal(0)),
+    ).subquery()
+    return (
+        select(entries.c.name, func.sum(entries.c.value).label("value"), func.sum(entries.c.base).label("base"))
+        .group_by(entries.c.name)
+    )
+
+
+def compute_counters(db: Session) -> dict:
+    """Every dashboard total, plus the live low-stock count, in one query"""
+    orders, products, customers = _computed()
+    row = db.execute(
+        select(orders, products, customers)
+        .select_from(orders.join(products, true()).join(customers, true()))
+    ).one()
+    return dict(row._mapping)
+
+
+def _compute_and_count(db: Session):
+    """Recomputed values and current totals from one statement, so one snapshot"""
+    orders, products, customers = _computed()
+    counted = _counted().subquery()
+    totals = select(*[
+        func.coalesce(func.sum(case((counted.c.name == name, counted.c.value), else_=0)), 0).label(f"counted_{name}")
+        for name in COUNTER_NAMES
+    ]).subquery()
+    row = db.execute(
+        select(orders, products, customers, totals)
+        .select_from(orders.join(products, true()).join(customers, true()).join(totals, true()))
+    ).one()._mapping
+    return (
+        {name: row[name] for name in COUNTER_NAMES},
+        {name: row[f"counted_{name}"] for name in COUNTER_NAMES},
+    )
+
+
+def count_low_stock(db: Session) -> int:
+    # Stock moves on every checkout, so this one stays a live count
+    return db.query(func.count(Product.id)).filter(Product.stock_quantity < LOW_STOCK_THRESHOLD).scalar()
+
+
+def update_counters(db: Session, **deltas):
+    """Record ``name=delta`` changes as delta rows in the caller's transaction"""
+    rows = [{"name": name, "delta": delta} for name, delta in deltas.items() if delta]
+    if rows:
+        db.execute(insert(StatCounterDelta), rows)
+
+
+def seed_counters(db: Session):
+    """Insert any missing base rows so that their totals match the data"""
+    existing = {name for (name,) in db.query(StatCounter.name)}
+    missing = [name for name in COUNTER_NAMES if name not in existing]
+    if not missing:
+        return
+
+    values, counted = _compute_and_count(db)
+    for name in missing:
+        try:
+            with db.begin_nested():
+                # Deltas already recorded for it stay and count on top
+                db.add(StatCounter(name=name, value=values[name] - counted[name]))
+        except IntegrityError:
+            # A concurrent request seeded it first
+            pass
+
+
+def read_counters(db: Session) -> dict:
+    """Current dashboard totals, seeding the table on first use"""
+    rows = db.execute(_counted()).all()
+    if not all(any(row.name == name and row.base for row in rows) for name in COUNTER_NAMES):
+        seed_counters(db)
+        db.commit()
+        rows = db.execute(_counted()).all()
+    return {row.name: row.value for row in rows}
+
+
+def fold_counter_deltas(db: Session, batch_size: int) -> int:
+    """Move up to ``batch_size`` deltas into the base rows; returns how many"""
+    deltas = (
+        db.query(StatCounterDelta.id, StatCounterDelta.name, StatCounterDelta.delta)
+        .order_by(StatCounterDelta.id)
+        .limit(batch_size)
+        .all()
+    )
+    if not deltas:
+        return 0
+
+    seed_counters(db)
+    totals = {}
+    for _, name, delta in deltas:
+        totals[name] = totals.get(name, 0) + delta
+    db.execute(
+        update(StatCounter)
+        .where(StatCounter.name.in_(totals))
+        .values(value=StatCounter.value + case(totals, value=StatCounter.name))
+        .execution_options(synchronize_session=False)
+    )
+    # Exactly the rows summed: ones committed meanwhile wait for the next fold
+    db.query(StatCounterDelta).filter(
+        StatCounterDelta.id.in_([delta_id for delta_id, _, _ in deltas])
+    ).delete(synchronize_session=False)
+    db.commit()
+    return len(deltas)
+
+
+def reconcile_counters(db: Session) -> int:
+    """Recompute every counter and correct drift; returns the number corrected"""
+    seed_counters(db)
+    values, counted = _compute_and_count(db)
+    corrections = {
+        name: values[name] - counted[name]
+        for name in COUNTER_NAMES
+        if abs(values[name] - counted[name]) > 0.005
+    }
+    update_counters(db, **corrections)
+    db.commit()
+    return len(corrections)
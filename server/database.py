@@ -1,22 +1,244 @@
+import logging
+import threading
+import time
+import uuid
 from sqlalchemy import create_engine
+from sqlalchemy.engine import CursorResult, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from starlette.concurrency import run_in_threadpool
 from config import settings
 
-# Configure engine based on database type
-connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-engine = create_engine(settings.DATABASE_URL, connect_args=connect_args)
+
+class PoolStats:
+    """Checkout wait times and saturation for one engine's pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.peak_checked_out = 0
+        self._lock = threading.Lock()
+
+    def record(self, waited: float, checked_out: int):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+
+class _InstrumentedPoolMixin:
+    """Times every checkout; with NullPool that is the connect time"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_timeout()
+            logger.warning(f"Database pool exhausted: {self.status()}")
+            raise
+        checked_out = self.checkedout() if isinstance(self, QueuePool) else 0
+        self.stats.record(time.perf_counter() - started, checked_out)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class InstrumentedNullPool(_InstrumentedPoolMixin, NullPool):
+    pass
+
+
+def _engine_options(url: str, queue_pool, is_async: bool = False) -> dict:
+    """Pool configuration from settings for one engine"""
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    connect_args = {}
+    parsed = make_url(url)
+
+    if parsed.get_backend_name() == "sqlite":
+        if not is_async:
+            connect_args["check_same_thread"] = False
+        if parsed.database in (None, "", ":memory:"):
+            # In-memory databases live in one connection; keep SQLAlchemy's default pool
+            options["connect_args"] = connect_args
+            return options
+
+    if settings.DB_SERVERLESS:
+        options["poolclass"] = InstrumentedNullPool
+        if parsed.get_dialect().driver == "asyncpg":
+            # Prepared statements do not survive a transaction-mode pooler
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    else:
+        options.update(
+            poolclass=queue_pool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+
+    options["connect_args"] = connect_args
+    return options
+
+
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL, InstrumentedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
+def get_async_database_url() -> str:
+    """ASYNC_DATABASE_URL, or DATABASE_URL switched to its async driver"""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+
+    url = settings.DATABASE_URL
+    for prefix, async_prefix in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+
+# Async engine for the async routes, only built when DB_ASYNC is enabled
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ASYNC:
+    async_engine = create_async_engine(
+        get_async_database_url(),
+        **_engine_options(get_async_database_url(), InstrumentedAsyncQueuePool, is_async=True)
+    )
+    # Objects stay usable after commit; lazy loads are not possible on an AsyncSession
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def _pool_stats(engine) -> dict:
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__.replace("Instrumented", "")}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + settings.DB_MAX_OVERFLOW
+        stats.update(
+            size=pool.size(),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(0, pool.overflow()),
+            saturation=round(pool.checkedout() / capacity, 2) if capacity else 0.0,
+            peak_checked_out=pool.stats.peak_checked_out,
+        )
+    if isinstance(pool, _InstrumentedPoolMixin):
+        pool_stats = pool.stats
+        checkouts = pool_stats.checkouts
+        stats.update(
+            checkouts=checkouts,
+            timeouts=pool_stats.timeouts,
+            avg_wait_ms=round(pool_stats.total_wait / checkouts * 1000, 2) if checkouts else 0.0,
+            max_wait_ms=round(pool_stats.max_wait * 1000, 2),
+        )
+    return stats
+
+
+def db_pool_stats() -> dict:
+    """Pool usage for the admin metrics endpoint"""
+    stats = {"serverless": settings.DB_SERVERLESS, "sync": _pool_stats(engine)}
+    if async_engine is not None:
+        stats["async"] = _pool_stats(async_engine.sync_engine)
+    return stats
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+class ThreadedSession:
+    """The AsyncSession interface the async routes use, over a regular Session.
+
+    Every call that talks to the database runs in the threadpool, so async
+    routes never block the event loop even when DB_ASYNC is off.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    async def execute(self, statement, params=None):
+        def execute():
+            result = self.sync_session.execute(statement, params)
+            if isinstance(result, CursorResult) and not result.returns_rows:
+                return result
+            # Buffer the rows so reading the result does no I/O on the loop
+            return result.freeze()()
+        return await run_in_threadpool(execute)
+
+    async def get(self, entity, ident):
+        return await run_in_threadpool(self.sync_session.get, entity, ident)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance):
+        await run_in_threadpool(self.sync_session.refresh, instance)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+async def get_async_db():
+    """AsyncSession dependency: native async driver with DB_ASYNC, threadpool otherwise"""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+
+    db = ThreadedSession(SessionLocal())
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -1,186 +1,284 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from config import settings
-from typing import List
+"""
+Transactional email
+
+Routes never talk to the mail server. They call ``enqueue_email`` to add a
+row to ``email_outbox`` in the same transaction as the user or order it is
+about, and the scheduler drains the outbox in the background over a single
+SMTP connection per batch, retrying with exponential backoff and parking
+messages that keep failing as dead.
+"""
+
+import json
 import logging
+import smtplib
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import Optional
+from sqlalchemy.orm import Session
+from config import settings
+from models import EmailOutbox, OutboxStatus
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.MAIL_USERNAME,
-    MAIL_PASSWORD=settings.MAIL_PASSWORD,
-    MAIL_FROM=settings.MAIL_FROM,
-    MAIL_PORT=settings.MAIL_PORT,
-    MAIL_SERVER=settings.MAIL_SERVER,
-    MAIL_FROM_NAME=settings.MAIL_FROM_NAME,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True
-)
 
-fm = FastMail(conf)
+def render_verification_email(token: str):
+    """Verification email sent after registration"""
+    verification_url = f"{settings.FRONTEND_URL}/verify-email?token={token}"
+    
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .button {{ 
+                display: inline-block; 
+                padding: 12px 24px; 
+                background-color: #4F46E5; 
+                color: white; 
+                text-decoration: none; 
+                border-radius: 5px;
+                margin: 20px 0;
+            }}
+            .footer {{ margin-top: 30px; font-size: 12px; color: #666; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h2>Welcome to {settings.MAIL_FROM_NAME}!</h2>
+            <p>Thank you for registering. Please verify your email address to complete your registration.</p>
+            <a href="{verification_url}" class="button">Verify Email Address</a>
+            <p>Or copy and paste this link into your browser:</p>
+            <p>{verification_url}</p>
+            <div class="footer">
+                <p>If you didn't create an account, please ignore this email.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    return "Verify Your Email Address", html
 
 
-async def send_verification_email(email: str, token: str):
-    """Send verification email to user"""
-    try:
-        verification_url = f"{settings.FRONTEND_URL}/verify-email?token={token}"
-        
-        logger.info(f"Sending verification email to {email}")
-        logger.info(f"Verification URL: {verification_url}")
-        
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .button {{ 
-                    display: inline-block; 
-                    padding: 12px 24px; 
-                    background-color: #4F46E5; 
-                    color: white; 
-                    text-decoration: none; 
-                    border-radius: 5px;
-                    margin: 20px 0;
-                }}
-                .footer {{ margin-top: 30px; font-size: 12px; color: #666; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>Welcome to {settings.MAIL_FROM_NAME}!</h2>
-                <p>Thank you for registering. Please verify your email address to complete your registration.</p>
-                <a href="{verification_url}" class="button">Verify Email Address</a>
-                <p>Or copy and paste this link into your browser:</p>
-                <p>{verification_url}</p>
-                <div class="footer">
-                    <p>If you didn't create an account, please ignore this email.</p>
-                </div>
+def render_password_reset_email(token: str):
+    """Password reset email"""
+    reset_url = f"{settings.FRONTEND_URL}/reset-password?token={token}"
+    
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .button {{ 
+                display: inline-block; 
+                padding: 12px 24px; 
+                background-color: #4F46E5; 
+                color: white; 
+                text-decoration: none; 
+                border-radius: 5px;
+                margin: 20px 0;
+            }}
+            .footer {{ margin-top: 30px; font-size: 12px; color: #666; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h2>Password Reset Request</h2>
+            <p>We received a request to reset your password. Click the button below to reset it:</p>
+            <a href="{reset_url}" class="button">Reset Password</a>
+            <p>Or copy and paste this link into your browser:</p>
+            <p>{reset_url}</p>
+            <p>This link will expire in 1 hour.</p>
+            <div class="footer">
+                <p>If you didn't request a password reset, please ignore this email or contact support if you have concerns.</p>
             </div>
-        </body>
-        </html>
-        """
-        
-        message = MessageSchema(
-            subject="Verify Your Email Address",
-            recipients=[email],
-            body=html,
-            subtype=MessageType.html
-        )
-        
-        await fm.send_message(message)
-        logger.info(f"Verification email sent successfully to {email}")
-        
-    except Exception as e:
-        logger.error(f"Failed to send verification email to {email}: {str(e)}")
-        logger.error(f"Error type: {type(e).__name__}")
-        raise Exception(f"Failed to send verification email: {str(e)}")
+        </div>
+    </body>
+    </html>
+    """
+    
+    return "Password Reset Request", html
 
 
-async def send_password_reset_email(email: str, token: str):
-    """Send password reset email to user"""
-    try:
-        reset_url = f"{settings.FRONTEND_URL}/reset-password?token={token}"
-        
-        logger.info(f"Sending password reset email to {email}")
-        
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .button {{ 
-                    display: inline-block; 
-                    padding: 12px 24px; 
-                    background-color: #4F46E5; 
-                    color: white; 
-                    text-decoration: none; 
-                    border-radius: 5px;
-                    margin: 20px 0;
-                }}
-                .footer {{ margin-top: 30px; font-size: 12px; color: #666; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>Password Reset Request</h2>
-                <p>We received a request to reset your password. Click the button below to reset it:</p>
-                <a href="{reset_url}" class="button">Reset Password</a>
-                <p>Or copy and paste this link into your browser:</p>
-                <p>{reset_url}</p>
-                <p>This link will expire in 1 hour.</p>
-                <div class="footer">
-                    <p>If you didn't request a password reset, please ignore this email or contact support if you have concerns.</p>
-                </div>
+def render_order_confirmation_email(order_number: str, total_amount: float):
+    """Order confirmation email"""
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .order-info {{ background-color: #f4f4f4; padding: 15px; border-radius: 5px; margin: 20px 0; }}
+            .footer {{ margin-top: 30px; font-size: 12px; color: #666; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h2>Order Confirmation</h2>
+            <p>Thank you for your order!</p>
+            <div class="order-info">
+                <p><strong>Order Number:</strong> {order_number}</p>
+                <p><strong>Total Amount:</strong> ${total_amount:.2f}</p>
+            </div>
+            <p>We've received your order and will send you a shipping confirmation email as soon as your order ships.</p>
+            <div class="footer">
+                <p>Thank you for shopping with us!</p>
             </div>
-        </body>
-        </html>
-        """
+        </div>
+    </body>
+    </html>
+    """
+    
+    return f"Order Confirmation - {order_number}", html
+
+
+TEMPLATES = {
+    "verification": render_verification_email,
+    "password_reset": render_password_reset_email,
+    "order_confirmation": render_order_confirmation_email,
+}
+
+
+def enqueue_email(db: Session, template: str, recipient: str, **params) -> EmailOutbox:
+    """Queue an email in the caller's transaction; it is sent once that commits"""
+    if template not in TEMPLATES:
+        raise ValueError(f"Unknown email template: {template}")
+    
+    message = EmailOutbox(
+        template=template,
+        recipient=recipient,
+        payload=json.dumps(params),
+        status=OutboxStatus.PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.add(message)
+    return message
+
+
+def _build_message(entry: EmailOutbox) -> EmailMessage:
+    subject, html = TEMPLATES[entry.template](**json.loads(entry.payload))
+    
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+    message["To"] = entry.recipient
+    message.set_content(html, subtype="html")
+    return message
+
+
+def _connect() -> smtplib.SMTP:
+    """Open one authenticated SMTP connection"""
+    smtp_class = smtplib.SMTP_SSL if settings.MAIL_SSL_TLS else smtplib.SMTP
+    connection = smtp_class(
+        settings.MAIL_SERVER,
+        settings.MAIL_PORT,
+        timeout=settings.MAIL_TIMEOUT_SECONDS
+    )
+    if settings.MAIL_STARTTLS and not settings.MAIL_SSL_TLS:
+        connection.starttls()
+    if settings.MAIL_USE_CREDENTIALS:
+        connection.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
+    return connection
+
+
+def _schedule_retry(entry: EmailOutbox, error: str, now: datetime):
+    entry.attempts += 1
+    entry.last_error = error[:1000]
+    if entry.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        entry.status = OutboxStatus.DEAD
+        logger.error(f"Giving up on email {entry.id} ({entry.template}) after {entry.attempts} attempts: {error}")
+    else:
+        delay = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (entry.attempts - 1)
+        entry.next_attempt_at = now + timedelta(seconds=delay)
+
+
+def send_outbox_batch(db: Session, connection: Optional[smtplib.SMTP], batch_size: int):
+    """Send one batch of due messages.
+
+    Returns ``(connection, claimed, sent)``; ``connection`` is None when the
+    mail server could not be reached, which ends the current drain.
+    """
+    now = datetime.utcnow()
+    
+    # SKIP LOCKED lets several drainers share the table without double sends
+    entries = db.query(EmailOutbox).filter(
+        EmailOutbox.status == OutboxStatus.PENDING,
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.id).limit(batch_size).with_for_update(skip_locked=True).all()
+    
+    sent = 0
+    for entry in entries:
+        try:
+            message = _build_message(entry)
+        except Exception as e:
+            # A payload that cannot render will never succeed
+            entry.attempts += 1
+            entry.last_error = f"Render failed: {str(e)}"[:1000]
+            entry.status = OutboxStatus.DEAD
+            continue
         
-        message = MessageSchema(
-            subject="Password Reset Request",
-            recipients=[email],
-            body=html,
-            subtype=MessageType.html
-        )
+        if connection is None:
+            try:
+                connection = _connect()
+            except (smtplib.SMTPException, OSError) as e:
+                logger.error(f"Could not connect to mail server: {str(e)}")
+                # The rest of the batch stays pending without burning attempts
+                _schedule_retry(entry, str(e), now)
+                break
         
-        await fm.send_message(message)
-        logger.info(f"Password reset email sent successfully to {email}")
+        try:
+            connection.send_message(message)
+        except (smtplib.SMTPException, OSError) as e:
+            _schedule_retry(entry, str(e), now)
+            if isinstance(e, (smtplib.SMTPServerDisconnected, OSError)):
+                connection.close()
+                connection = None
+            continue
         
-    except Exception as e:
-        logger.error(f"Failed to send password reset email to {email}: {str(e)}")
-        raise Exception(f"Failed to send password reset email: {str(e)}")
+        entry.status = OutboxStatus.SENT
+        entry.attempts += 1
+        entry.sent_at = datetime.utcnow()
+        entry.last_error = None
+        sent += 1
+    
+    db.commit()
+    return connection, len(entries), sent
 
 
-async def send_order_confirmation_email(email: str, order_number: str, total_amount: float):
-    """Send order confirmation email to user"""
+def drain_outbox(db: Session) -> dict:
+    """Send everything that is due, reusing one SMTP connection across batches"""
+    connection = None
+    claimed_total = 0
+    sent_total = 0
     try:
-        logger.info(f"Sending order confirmation email to {email}")
-        
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .order-info {{ background-color: #f4f4f4; padding: 15px; border-radius: 5px; margin: 20px 0; }}
-                .footer {{ margin-top: 30px; font-size: 12px; color: #666; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>Order Confirmation</h2>
-                <p>Thank you for your order!</p>
-                <div class="order-info">
-                    <p><strong>Order Number:</strong> {order_number}</p>
-                    <p><strong>Total Amount:</strong> ${total_amount:.2f}</p>
-                </div>
-                <p>We've received your order and will send you a shipping confirmation email as soon as your order ships.</p>
-                <div class="footer">
-                    <p>Thank you for shopping with us!</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        message = MessageSchema(
-            subject=f"Order Confirmation - {order_number}",
-            recipients=[email],
-            body=html,
-            subtype=MessageType.html
-        )
-        
-        await fm.send_message(message)
-        logger.info(f"Order confirmation email sent successfully to {email}")
-        
-    except Exception as e:
-        logger.error(f"Failed to send order confirmation email to {email}: {str(e)}")
-        raise Exception(f"Failed to send order confirmation email: {str(e)}")
\ No newline at end of file
+        for _ in range(settings.OUTBOX_MAX_BATCHES_PER_RUN):
+            connection, claimed, sent = send_outbox_batch(db, connection, settings.OUTBOX_BATCH_SIZE)
+            claimed_total += claimed
+            sent_total += sent
+            if connection is None or claimed < settings.OUTBOX_BATCH_SIZE:
+                break
+    finally:
+        if connection is not None:
+            try:
+                connection.quit()
+            except (smtplib.SMTPException, OSError):
+                connection.close()
+    
+    # Keep sent messages around for a while for support lookups
+    cutoff = datetime.utcnow() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    purged = db.query(EmailOutbox).filter(
+        EmailOutbox.status == OutboxStatus.SENT,
+        EmailOutbox.sent_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+    
+    return {"claimed": claimed_total, "sent": sent_total, "unsent": claimed_total - sent_total, "purged": purged}
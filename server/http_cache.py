@@ -0,0 +1,88 @@
+"""
+HTTP conditional caching for public read endpoints
+
+Each cacheable representation is built once into an entry holding the
+JSON body, a strong ETag (hash of the body) and a Last-Modified stamp, and
+stored in the catalog cache like any other read. A request whose
+If-None-Match or If-Modified-Since matches gets a 304 straight from that
+entry: no query, no serialization. Bodies large enough to compress are
+also stored compressed with every available coding, so a hit does no
+compression either.
+
+Last-Modified is when the entry was generated, not the newest row
+timestamp: a deleted row or a renamed category changes the body without
+moving any ``updated_at`` forward. Entries are rebuilt on invalidation, so
+the stamp only moves when the content may have changed.
+"""
+
+import base64
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+from pagination import NEXT_CURSOR_HEADER
+from compression import available_encodings, compress, encoded_etag, negotiate
+from config import settings
+
+
+def build_entry(body: str, next_cursor: Optional[str] = None) -> dict:
+    """Cacheable representation of a response body"""
+    raw = body.encode("utf-8")
+    encoded = {}
+    if settings.COMPRESSION_ENABLED and len(raw) >= settings.COMPRESSION_MIN_SIZE:
+        # base64 so the entry still round-trips through the JSON in Redis
+        encoded = {
+            encoding: base64.b64encode(compress(raw, encoding)).decode("ascii")
+            for encoding in available_encodings()
+        }
+    return {
+        "body": body,
+        "etag": f'"{hashlib.blake2b(raw, digest_size=16).hexdigest()}"',
+        "last_modified": format_datetime(datetime.now(timezone.utc).replace(microsecond=0), usegmt=True),
+        "next_cursor": next_cursor,
+        "encoded": encoded,
+    }
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison (RFC 9110 13.1.2)
+    if header.strip() == "*":
+        return True
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return etag in candidates
+
+
+def is_not_modified(request: Request, entry: dict, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and entry.get("last_modified"):
+        try:
+            return parsedate_to_datetime(entry["last_modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def conditional_response(request: Request, entry: dict, cache_control: str) -> Response:
+    """200 with the body and validators, or 304 when the client's copy is current"""
+    encoding = negotiate(request.headers.get("accept-encoding", ""))
+    encoded = entry.get("encoded", {}).get(encoding) if encoding else None
+    etag = encoded_etag(entry["etag"], encoding) if encoded else entry["etag"]
+
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if entry.get("last_modified"):
+        headers["Last-Modified"] = entry["last_modified"]
+    if entry.get("next_cursor"):
+        headers[NEXT_CURSOR_HEADER] = entry["next_cursor"]
+
+    if is_not_modified(request, entry, etag):
+        return Response(status_code=304, headers=headers)
+    if encoded:
+        headers["Content-Encoding"] = encoding
+        return Response(content=base64.b64decode(encoded), media_type="application/json", headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
@@ -0,0 +1,342 @@
+"""
+Stock reservations and sharded stock counters
+
+``Product.stock_quantity`` is stock available to sell. Depending on
+STOCK_RESERVATION_MODE, stock is taken out of it when an item is added to
+the cart ("cart"), when checkout starts ("checkout") or only when the order
+is placed ("off"). A reservation records what a user holds until
+``expires_at``; checkout converts it into the order without touching the
+product row again, and the scheduler returns expired reservations to stock.
+
+A hot product can have its available stock split across
+``product_stock_shards`` rows. Each buyer decrements one random shard that
+nobody else holds (SKIP LOCKED), so concurrent buyers of one product stop
+queueing on a single row lock. ``stock_quantity`` is then the total of the
+shards, refreshed by the scheduler.
+
+Everything here runs in the caller's transaction; callers commit or roll
+back.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+from sqlalchemy import case, exists, func, select, update
+from sqlalchemy.orm import Session
+from models import Product, ProductStockShard, StockReservation
+from config import settings
+
+MODES = ("off", "cart", "checkout")
+
+
+def reservation_mode() -> str:
+    return settings.STOCK_RESERVATION_MODE
+
+
+def _shard_counts(db: Session, product_ids: Iterable[int]) -> Dict[int, int]:
+    return dict(db.query(Product.id, Product.stock_shards).filter(Product.id.in_(list(product_ids))))
+
+
+def _pick_shard(db: Session, product_id: int, quantity: int, skip_locked: bool):
+    """Lock one random shard that covers the quantity, or None"""
+    return db.execute(
+        select(ProductStockShard.shard)
+        .where(ProductStockShard.product_id == product_id, ProductStockShard.available >= quantity)
+        .order_by(func.random())
+        .limit(1)
+        .with_for_update(skip_locked=skip_locked)
+    ).scalar()
+
+
+def _take_from_shard(db: Session, product_id: int, shard: int, quantity: int) -> bool:
+    result = db.execute(
+        update(ProductStockShard)
+        .where(
+            ProductStockShard.product_id == product_id,
+            ProductStockShard.shard == shard,
+            ProductStockShard.available >= quantity
+        )
+        .values(available=ProductStockShard.available - quantity)
+    )
+    return result.rowcount == 1
+
+
+def _take_from_shards(db: Session, product_id: int, quantity: int) -> bool:
+    # Fast path: a shard that covers the quantity and that no other buyer holds
+    shard = _pick_shard(db, product_id, quantity, skip_locked=True)
+    if shard is not None and _take_from_shard(db, product_id, shard, quantity):
+        return True
+
+    # More buyers than shards: queue on one random shard that covers the
+    # quantity, so waiting buyers stay spread over the shards. Postgres
+    # returns no row when the shard it waited for no longer covers the
+    # quantity, so try again while some shard still does.
+    while True:
+        shard = _pick_shard(db, product_id, quantity, skip_locked=False)
+        if shard is not None and _take_from_shard(db, product_id, shard, quantity):
+            return True
+        if not db.query(
+            exists().where(
+                ProductStockShard.product_id == product_id,
+                ProductStockShard.available >= quantity
+            )
+        ).scalar():
+            break
+
+    # Near sell-out, no single shard covers the quantity: sweep them all
+    shards = (
+        db.query(ProductStockShard)
+        .filter(ProductStockShard.product_id == product_id, ProductStockShard.available > 0)
+        .order_by(ProductStockShard.shard)
+        .with_for_update()
+        .all()
+    )
+    if sum(row.available for row in shards) < quantity:
+        return False
+    remaining = quantity
+    for row in shards:
+        taken = min(row.available, remaining)
+        row.available -= taken
+        remaining -= taken
+        if not remaining:
+            break
+    db.flush()
+    return True
+
+
+def move_stock(db: Session, deltas: Dict[int, int]) -> List[int]:
+    """Apply ``{product_id: delta}`` to available stock; returns the ids that were short.
+
+    Positive deltas are taken, negative ones given back. Rows are locked in
+    one pass in product id order (plain products, then shards), so
+    concurrent moves cannot deadlock whatever mix of products they touch.
+    Plain products change with one conditional UPDATE. When something is
+    short, stock may already have moved for other products: the caller
+    must roll back.
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+
+    shard_counts = _shard_counts(db, deltas)
+    short = [product_id for product_id, delta in deltas.items() if delta > 0 and product_id not in shard_counts]
+    if short:
+        return short
+
+    plain = sorted(product_id for product_id, shards in shard_counts.items() if not shards)
+    if plain:
+        available = dict(
+            db.query(Product.id, Product.stock_quantity)
+            .filter(Product.id.in_(plain))
+            .order_by(Product.id)
+            .with_for_update()
+        )
+        short = [product_id for product_id in plain if available[product_id] < deltas[product_id]]
+        if short:
+            return short
+
+        # The stock_quantity >= delta guard makes it safe where FOR UPDATE is a no-op (SQLite)
+        delta = case({product_id: deltas[product_id] for product_id in plain}, value=Product.id)
+        result = db.execute(
+            update(Product)
+            .where(Product.id.in_(plain), Product.stock_quantity >= delta)
+            .values(stock_quantity=Product.stock_quantity - delta)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(plain):
+            return [product_id for product_id in plain if deltas[product_id] > 0]
+
+    for product_id in sorted(product_id for product_id, shards in shard_counts.items() if shards):
+        delta = deltas[product_id]
+        if delta > 0:
+            if not _take_from_shards(db, product_id, delta):
+                short.append(product_id)
+        else:
+            db.execute(
+                update(ProductStockShard)
+                .where(
+                    ProductStockShard.product_id == product_id,
+                    ProductStockShard.shard == random.randrange(shard_counts[product_id])
+                )
+                .values(available=ProductStockShard.available - delta)
+            )
+    return short
+
+
+def take_stock(db: Session, quantities: Dict[int, int]) -> List[int]:
+    """Take ``{product_id: quantity}`` out of available stock; returns the ids that were short"""
+    return move_stock(db, {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0})
+
+
+def give_back(db: Session, quantities: Dict[int, int]):
+    """Return ``{product_id: quantity}`` to available stock"""
+    move_stock(db, {product_id: -quantity for product_id, quantity in quantities.items() if quantity > 0})
+
+
+def set_reservations(db: Session, user_id: int, quantities: Dict[int, int], replace: bool = False) -> List[int]:
+    """Make the user's reservations match ``{product_id: quantity}`` and restart their TTL.
+
+    Only the difference to what the user already holds is taken or given
+    back. With ``replace`` every other reservation of the user is released.
+    Returns the product ids that were short; the caller must then roll back.
+    """
+    reservations = db.query(StockReservation).filter(StockReservation.user_id == user_id)
+    if not replace:
+        reservations = reservations.filter(StockReservation.product_id.in_(list(quantities)))
+    held = {
+        reservation.product_id: reservation
+        for reservation in reservations.order_by(StockReservation.product_id).with_for_update()
+    }
+
+    wanted = {product_id: max(quantity, 0) for product_id, quantity in quantities.items()}
+    if replace:
+        for product_id in held:
+            wanted.setdefault(product_id, 0)
+
+    short = move_stock(db, {
+        product_id: quantity - (held[product_id].quantity if product_id in held else 0)
+        for product_id, quantity in wanted.items()
+    })
+    if short:
+        return short
+
+    expires_at = datetime.utcnow() + timedelta(seconds=settings.STOCK_RESERVATION_TTL_SECONDS)
+    for product_id, quantity in wanted.items():
+        reservation = held.get(product_id)
+        if quantity == 0:
+            if reservation is not None:
+                db.delete(reservation)
+        elif reservation is not None:
+            reservation.quantity = quantity
+            reservation.expires_at = expires_at
+        else:
+            db.add(StockReservation(
+                user_id=user_id, product_id=product_id, quantity=quantity, expires_at=expires_at
+            ))
+    db.flush()
+    return []
+
+
+def consume_reservations(db: Session, user_id: int, quantities: Dict[int, int]) -> Dict[int, int]:
+    """Turn the user's reservations into an order of ``{product_id: quantity}``.
+
+    Every reservation of the user ends here (checkout empties the cart).
+    Returns the stock still to move, for ``move_stock``: what the
+    reservations did not cover as positive deltas, reserved units the
+    order does not use as negative ones. Expired reservations the scheduler
+    has not released yet still hold their stock and count.
+    """
+    deltas = dict(quantities)
+    for reservation in (
+        db.query(StockReservation)
+        .filter(StockReservation.user_id == user_id)
+        .order_by(StockReservation.product_id)
+        .with_for_update()
+    ):
+        deltas[reservation.product_id] = deltas.get(reservation.product_id, 0) - reservation.quantity
+        db.delete(reservation)
+    return {product_id: delta for product_id, delta in deltas.items() if delta}
+
+
+def release_expired_reservations(db: Session, batch_size: int) -> int:
+    """Give the stock of up to ``batch_size`` expired reservations back; returns how many"""
+    expired = (
+        db.query(StockReservation)
+        .filter(StockReservation.expires_at < datetime.utcnow())
+        .order_by(StockReservation.expires_at)
+        .limit(batch_size)
+        # A checkout converting one of these holds it; leave it to the checkout
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not expired:
+        return 0
+
+    quantities = {}
+    for reservation in expired:
+        quantities[reservation.product_id] = quantities.get(reservation.product_id, 0) + reservation.quantity
+        db.delete(reservation)
+    give_back(db, quantities)
+    db.commit()
+    return len(expired)
+
+
+def _write_shards(db: Session, product: Product, shards: int, stock: int):
+    """Replace the product's shard rows with ``stock`` split over ``shards``"""
+    db.query(ProductStockShard).filter(ProductStockShard.product_id == product.id).delete(
+        synchronize_session=False
+    )
+    if shards:
+        base, extra = divmod(max(stock, 0), shards)
+        db.add_all([
+            ProductStockShard(product_id=product.id, shard=shard, available=base + (1 if shard < extra else 0))
+            for shard in range(shards)
+        ])
+    product.stock_shards = shards
+    product.stock_quantity = max(stock, 0)
+    db.flush()
+
+
+def _lock_shards(db: Session, product_id: int) -> int:
+    """Lock every shard of the product; returns the stock they hold"""
+    return sum(
+        available for (available,) in db.query(ProductStockShard.available)
+        .filter(ProductStockShard.product_id == product_id)
+        .order_by(ProductStockShard.shard)
+        .with_for_update()
+    )
+
+
+def set_shards(db: Session, product: Product, shards: int):
+    """Split the product's available stock over ``shards`` rows, or fold it back with 0"""
+    # populate_existing: stock taken since ``product`` was loaded must count
+    db.query(Product).filter(Product.id == product.id).with_for_update().populate_existing().one()
+    stock = _lock_shards(db, product.id) if product.stock_shards else product.stock_quantity
+    _write_shards(db, product, shards, stock)
+
+
+def sync_shards(db: Session, product_ids: Iterable[int]):
+    """Redistribute ``stock_quantity`` written by an admin into the shards of sharded products"""
+    for product in (
+        db.query(Product)
+        .filter(Product.id.in_(list(product_ids)), Product.stock_shards > 0)
+        .order_by(Product.id)
+        .with_for_update()
+    ):
+        _lock_shards(db, product.id)
+        _write_shards(db, product, product.stock_shards, product.stock_quantity)
+
+
+def refresh_sharded_totals(db: Session) -> int:
+    """Copy each sharded product's shard total into stock_quantity; returns rows changed"""
+    total = (
+        select(func.coalesce(func.sum(ProductStockShard.available), 0))
+        .where(ProductStockShard.product_id == Product.id)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        update(Product)
+        .where(Product.stock_shards > 0, Product.stock_quantity != total)
+        .values(stock_quantity=total)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def stock_status(db: Session, product: Product) -> dict:
+    reserved = db.query(func.coalesce(func.sum(StockReservation.quantity), 0)).filter(
+        StockReservation.product_id == product.id
+    ).scalar()
+    shards = dict(
+        db.query(ProductStockShard.shard, ProductStockShard.available)
+        .filter(ProductStockShard.product_id == product.id)
+        .order_by(ProductStockShard.shard)
+    )
+    return {
+        "product_id": product.id,
+        "stock_quantity": sum(shards.values()) if product.stock_shards else product.stock_quantity,
+        "reserved": reserved,
+        "shards": product.stock_shards,
+        "shard_stock": list(shards.values()),
+    }
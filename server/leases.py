@@ -0,0 +1,221 @@
+"""
+Cluster-wide leases for scheduled jobs
+
+Every worker starts the scheduler, so each leased job first takes a lease:
+a Postgres advisory lock held on a dedicated connection, or a Redis key set
+with NX and a TTL that a background thread keeps renewing. The holder then
+checks ``scheduler_job_runs`` and skips the run if another worker already
+started the job within this interval, so each job runs once per cluster
+per interval. The same table is the job status report.
+"""
+
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable
+import redis
+from sqlalchemy import func, select
+from database import engine, SessionLocal
+from models import SchedulerJobRun
+from cache import get_redis
+from config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Identifies this worker in the status table and in Redis lease values
+HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+
+# A run counts for its interval if it started within this fraction of it,
+# leaving slack for workers whose timers fire a little apart
+RUN_GAP_FRACTION = 0.9
+
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_skipped = defaultdict(int)
+
+
+def lease_backend() -> str:
+    """SCHEDULER_LOCK_BACKEND; "auto" is Postgres advisory locks on Postgres, no lease elsewhere"""
+    backend = settings.SCHEDULER_LOCK_BACKEND
+    if backend != "auto":
+        return backend
+    return "postgres" if engine.dialect.name == "postgresql" else "none"
+
+
+@contextmanager
+def _postgres_lease(job_id: str):
+    # Session-level lock: released on unlock, or by the server if this worker dies
+    key = zlib.crc32(f"scheduler:{job_id}".encode("utf-8"))
+    acquired = False
+    connection = engine.connect()
+    try:
+        acquired = connection.execute(select(func.pg_try_advisory_lock(key))).scalar()
+        yield acquired
+    finally:
+        if acquired:
+            connection.execute(select(func.pg_advisory_unlock(key)))
+        connection.close()
+
+
+@contextmanager
+def _redis_lease(job_id: str):
+    client = get_redis()
+    if client is None:
+        logger.warning(f"Redis unavailable, skipping {job_id}")
+        yield False
+        return
+
+    key = f"scheduler:lease:{job_id}"
+    token = f"{HOLDER}:{uuid.uuid4().hex[:8]}"
+    ttl_ms = int(settings.SCHEDULER_LEASE_TTL_SECONDS * 1000)
+    try:
+        acquired = bool(client.set(key, token, nx=True, px=ttl_ms))
+    except (redis.RedisError, OSError) as e:
+        logger.warning(f"Could not take lease for {job_id}: {str(e)}")
+        acquired = False
+    if not acquired:
+        yield False
+        return
+
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(settings.SCHEDULER_LEASE_TTL_SECONDS / 3):
+            try:
+                if not client.eval(_RENEW_SCRIPT, 1, key, token, ttl_ms):
+                    logger.warning(f"Lease for {job_id} expired while running")
+                    return
+            except (redis.RedisError, OSError) as e:
+                logger.warning(f"Could not renew lease for {job_id}: {str(e)}")
+
+    renewer = threading.Thread(target=renew, name=f"lease-{job_id}", daemon=True)
+    renewer.start()
+    try:
+        yield True
+    finally:
+        stop.set()
+        renewer.join(timeout=1)
+        try:
+            client.eval(_RELEASE_SCRIPT, 1, key, token)
+        except (redis.RedisError, OSError):
+            # It expires on its own
+            pass
+
+
+@contextmanager
+def _local_lease(job_id: str):
+    yield True
+
+
+_BACKENDS = {
+    "postgres": _postgres_lease,
+    "redis": _redis_lease,
+    "none": _local_lease,
+}
+
+
+def _start_run(job_id: str, interval_seconds: float) -> bool:
+    """Record the start of a run, or return False if this interval already had one"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        run = db.get(SchedulerJobRun, job_id)
+        if (
+            run is not None and run.last_started_at is not None
+            and (now - run.last_started_at).total_seconds() < interval_seconds * RUN_GAP_FRACTION
+        ):
+            return False
+
+        if run is None:
+            run = SchedulerJobRun(job_id=job_id, run_count=0)
+            db.add(run)
+        run.holder = HOLDER
+        run.last_started_at = now
+        run.last_status = "running"
+        run.last_error = None
+        run.run_count += 1
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+
+def _finish_run(job_id: str, status: str, duration: float, error: str = None):
+    db = SessionLocal()
+    try:
+        run = db.get(SchedulerJobRun, job_id)
+        if run is not None:
+            run.last_finished_at = datetime.utcnow()
+            run.last_duration_seconds = duration
+            run.last_status = status
+            run.last_error = error
+            db.commit()
+    finally:
+        db.close()
+
+
+def leased_job(job_id: str, interval_seconds: float, fn: Callable) -> Callable:
+    """Wrap ``fn`` so it runs at most once per interval across every worker.
+
+    A run is recorded as failed when ``fn`` raises, so jobs log their
+    errors and re-raise them. The wrapper returns "skipped", "succeeded"
+    or "failed".
+    """
+
+    @functools.wraps(fn)
+    def run() -> str:
+        with _BACKENDS[lease_backend()](job_id) as acquired:
+            if not acquired or not _start_run(job_id, interval_seconds):
+                _skipped[job_id] += 1
+                return "skipped"
+
+            started = time.perf_counter()
+            status, error = "succeeded", None
+            try:
+                fn()
+            except Exception as e:
+                status, error = "failed", str(e)
+                logger.error(f"Scheduled job {job_id} failed: {str(e)}")
+            finally:
+                _finish_run(job_id, status, time.perf_counter() - started, error)
+            return status
+
+    return run
+
+
+def job_runs(db) -> dict:
+    """Cluster-wide last run of every leased job"""
+    return {
+        run.job_id: {
+            "holder": run.holder,
+            "last_status": run.last_status,
+            "last_started_at": run.last_started_at,
+            "last_finished_at": run.last_finished_at,
+            "last_duration_seconds": run.last_duration_seconds,
+            "last_error": run.last_error,
+            "run_count": run.run_count,
+            "skipped_here": _skipped.get(run.job_id, 0),
+        }
+        for run in db.query(SchedulerJobRun)
+    }
@@ -0,0 +1,49 @@
+"""
+Eager loading strategies for endpoints that return nested schemas
+
+ProductResponse embeds its category, CartItemResponse and OrderItemResponse
+embed a ProductResponse and OrderResponse embeds its items. Left lazy, each
+of those is one SELECT per row while the response is serialized. These
+option sets load the whole tree up front so every response costs a fixed
+number of queries.
+"""
+
+from sqlalchemy.orm import joinedload, selectinload
+from models import Product, CartItem, Order, OrderItem, ProductReview
+
+
+def product_options():
+    """Many-to-one category, joined into the product SELECT"""
+    return (joinedload(Product.category),)
+
+
+def cart_item_options():
+    """Cart item -> product -> category, all in one joined SELECT"""
+    return (joinedload(CartItem.product).joinedload(Product.category),)
+
+
+def order_list_options():
+    """Orders page: one SELECT for the items of every order on the page.
+
+    selectinload keeps the collection out of the paged query so LIMIT still
+    counts orders, not order rows times items.
+    """
+    return (
+        selectinload(Order.order_items)
+        .joinedload(OrderItem.product)
+        .joinedload(Product.category),
+    )
+
+
+def order_detail_options():
+    """Single order: items, products and categories joined in one SELECT"""
+    return (
+        joinedload(Order.order_items)
+        .joinedload(OrderItem.product)
+        .joinedload(Product.category),
+    )
+
+
+def review_options():
+    """Reviewer name for ReviewResponse.user_name"""
+    return (joinedload(ProductReview.user),)
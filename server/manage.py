@@ -0,0 +1,99 @@
+"""
+Management commands
+
+    python manage.py create-schema
+    python manage.py seed-admin
+    python manage.py backfill-rollups [--start 2024-01-01] [--end 2024-02-01]
+    python manage.py import-products catalog.csv [--format csv|ndjson] [--batch-size 500]
+    python manage.py run-jobs
+"""
+
+import argparse
+from datetime import datetime
+
+
+def create_schema(args):
+    from bootstrap import create_schema
+    create_schema()
+    print("✅ Schema created")
+
+
+def seed_admin(args):
+    from bootstrap import seed_admin_user
+    from config import settings
+    if seed_admin_user():
+        print(f"✅ Admin user created: {settings.ADMIN_EMAIL}")
+    else:
+        print("ℹ️ Admin user already exists")
+
+
+def backfill_rollups(args):
+    from database import SessionLocal
+    from analytics import backfill_rollups
+    db = SessionLocal()
+    try:
+        days = backfill_rollups(db, args.start, args.end)
+    finally:
+        db.close()
+    print(f"✅ Sales rollups recomputed for {days} days")
+
+
+def import_products(args):
+    from database import SessionLocal
+    from product_import import detect_format, import_products
+    fmt = detect_format(args.path, args.format)
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as stream:
+            result = import_products(db, stream, fmt, args.batch_size)
+    finally:
+        db.close()
+
+    for error in result["errors"]:
+        print(f"  row {error['row']}: {error['error']}")
+    if result["errors_truncated"]:
+        print("  ...")
+    if result["aborted"]:
+        print(f"❌ {result['aborted']}")
+    print(
+        f"✅ {result['processed']} rows: {result['created']} created, "
+        f"{result['updated']} updated, {result['failed']} failed"
+    )
+
+
+def run_jobs(args):
+    from scheduler import run_jobs
+    for job_id, outcome in run_jobs().items():
+        print(f"  {job_id}: {outcome}")
+    print("✅ Background jobs run")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Noosh Tuft management commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("create-schema", help="Create missing tables (development; use Alembic in production)") \
+        .set_defaults(handler=create_schema)
+    commands.add_parser("seed-admin", help="Create the ADMIN_EMAIL user if missing") \
+        .set_defaults(handler=seed_admin)
+
+    backfill = commands.add_parser("backfill-rollups", help="Recompute sales analytics rollups")
+    backfill.add_argument("--start", type=datetime.fromisoformat, help="UTC, defaults to the first order")
+    backfill.add_argument("--end", type=datetime.fromisoformat, help="UTC, defaults to now")
+    backfill.set_defaults(handler=backfill_rollups)
+
+    importer = commands.add_parser("import-products", help="Create or update products from a CSV or NDJSON file")
+    importer.add_argument("path")
+    importer.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension")
+    importer.add_argument("--batch-size", type=int, help="Defaults to PRODUCT_IMPORT_BATCH_SIZE")
+    importer.set_defaults(handler=import_products)
+
+    commands.add_parser("run-jobs", help="Run the background jobs once (cron, when STARTUP_SCHEDULER=false)") \
+        .set_defaults(handler=run_jobs)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
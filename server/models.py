@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import (
+    Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Index, UniqueConstraint, Enum as SQLEnum
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -18,8 +20,18 @@ class OrderStatus(str, enum.Enum):
     CANCELLED = "cancelled"
 
 
+class OutboxStatus(str, enum.Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    DEAD = "dead"
+
+
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Unverified-user cleanup
+        Index("ix_users_is_verified_created_at", "is_verified", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -68,6 +80,8 @@ class Product(Base):
     is_active = Column(Boolean, default=True)
     is_featured = Column(Boolean, default=False)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    # > 0: available stock lives in product_stock_shards, stock_quantity is their total
+    stock_shards = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -75,10 +89,20 @@ class Product(Base):
     order_items = relationship("OrderItem", back_populates="product")
     cart_items = relationship("CartItem", back_populates="product")
     reviews = relationship("ProductReview", back_populates="product", cascade="all, delete-orphan")
+    rating_summary = relationship(
+        "ProductRatingSummary", back_populates="product", uselist=False, cascade="all, delete-orphan"
+    )
 
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Keyset pagination: newest first, for everyone and per customer
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Analytics: orders changed since the last rollup run
+        Index("ix_orders_updated_at", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     order_number = Column(String, unique=True, nullable=False)
@@ -140,6 +164,9 @@ class HandcraftPhoto(Base):
 
 class ProductReview(Base):
     __tablename__ = "product_reviews"
+    __table_args__ = (
+        Index("ix_product_reviews_product_id_created_at_id", "product_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -156,6 +183,119 @@ class ProductReview(Base):
     user = relationship("User", back_populates="reviews")
 
 
+class ProductRatingSummary(Base):
+    __tablename__ = "product_rating_summaries"
+    
+    # Maintained by the review routes, rebuilt periodically by the scheduler
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    total_reviews = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_1 = Column(Integer, nullable=False, default=0)
+    rating_2 = Column(Integer, nullable=False, default=0)
+    rating_3 = Column(Integer, nullable=False, default=0)
+    rating_4 = Column(Integer, nullable=False, default=0)
+    rating_5 = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    product = relationship("Product", back_populates="rating_summary")
+    
+    @property
+    def average_rating(self) -> float:
+        return self.rating_sum / self.total_reviews if self.total_reviews else 0.0
+
+
+class StatCounter(Base):
+    __tablename__ = "stat_counters"
+    
+    # Admin dashboard totals, maintained by the write paths and reconciled by the scheduler
+    name = Column(String(50), primary_key=True)
+    value = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class StatCounterDelta(Base):
+    __tablename__ = "stat_counter_deltas"
+    
+    # Pending changes to a StatCounter, appended by the write paths and folded in by the scheduler
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50), nullable=False)
+    delta = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class OrderRollup(Base):
+    __tablename__ = "order_rollups"
+    
+    # Orders per hour/day bucket (UTC), recomputed from orders by the scheduler
+    granularity = Column(String(5), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+
+
+class SalesRollup(Base):
+    __tablename__ = "sales_rollups"
+    
+    # Units and revenue per product per hour/day bucket (UTC)
+    granularity = Column(String(5), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    category_id = Column(Integer, nullable=True)
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+    
+    # Last order folded into the rollups
+    name = Column(String(50), primary_key=True)
+    last_order_id = Column(Integer, nullable=False)
+    last_order_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SchedulerJobRun(Base):
+    __tablename__ = "scheduler_job_runs"
+    
+    # Last run of each leased scheduler job, across all workers
+    job_id = Column(String(100), primary_key=True)
+    holder = Column(String, nullable=True)
+    last_status = Column(String(20), nullable=True)
+    last_started_at = Column(DateTime, nullable=True)
+    last_finished_at = Column(DateTime, nullable=True)
+    last_duration_seconds = Column(Float, nullable=True)
+    last_error = Column(Text, nullable=True)
+    run_count = Column(Integer, nullable=False, default=0)
+
+
+class StockReservation(Base):
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", name="uq_stock_reservations_user_id_product_id"),
+        Index("ix_stock_reservations_expires_at", "expires_at"),
+    )
+    
+    # Stock taken out of availability for a cart or checkout until expires_at
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ProductStockShard(Base):
+    __tablename__ = "product_stock_shards"
+    
+    # Available stock of a hot product split over rows buyers can update in parallel
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    available = Column(Integer, nullable=False, default=0)
+
+
 class HeroBanner(Base):
     __tablename__ = "hero_banners"
     
@@ -184,3 +324,21 @@ class AboutPage(Base):
     vision = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    template = Column(String, nullable=False)
+    recipient = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON template parameters
+    status = Column(SQLEnum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
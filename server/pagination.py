@@ -0,0 +1,98 @@
+"""
+Keyset (cursor) pagination helpers
+
+Listings hand out an opaque ``cursor`` in the ``X-Next-Cursor`` response
+header. Passing it back continues after the last row of the previous page
+with an index range seek instead of an OFFSET scan.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(
+        [value.isoformat() if isinstance(value, datetime) else value for value in values],
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        values = None
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return values
+
+
+def seek_by_id(query: Query, id_column, cursor: Optional[str], descending: bool = False) -> Query:
+    """Order by ``id_column`` and continue after ``cursor``"""
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        query = query.filter(id_column < last_id if descending else id_column > last_id)
+    return query.order_by(id_column.desc() if descending else id_column)
+
+
+def seek_by_created(query: Query, created_column, id_column, cursor: Optional[str]) -> Query:
+    """Order newest first by ``(created_column, id_column)`` and continue after ``cursor``"""
+    if cursor:
+        last_created, last_id = decode_cursor(cursor, 2)
+        try:
+            last_created = datetime.fromisoformat(last_created)
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        created = _comparable(query, created_column)
+        last_created = _comparable(query, last_created)
+        query = query.filter(or_(
+            created < last_created,
+            and_(created == last_created, id_column < last_id)
+        ))
+    return query.order_by(_comparable(query, created_column).desc(), id_column.desc())
+
+
+def _comparable(query: Query, value):
+    """``value`` in a form that compares by time.
+
+    SQLite keeps timestamps as text: server defaults as "YYYY-MM-DD
+    HH:MM:SS", bound datetimes with microseconds appended, so the two do
+    not compare as times there. Julian day numbers do.
+    """
+    if query.session.get_bind().dialect.name == "sqlite":
+        return func.julianday(value)
+    return value
+
+
+def fetch_page(
+    query: Query,
+    limit: int,
+    response: Response,
+    cursor_values: Callable[[Any], tuple],
+) -> List[Any]:
+    """Fetch one page and set ``X-Next-Cursor`` when more rows follow.
+
+    One extra row is read so the last page does not advertise a cursor
+    that would lead to an empty page.
+    """
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*cursor_values(rows[-1]))
+    return rows
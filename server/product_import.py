@@ -0,0 +1,263 @@
+"""
+Bulk product import
+
+Reads a CSV or NDJSON catalog as a stream, validates each row with
+``ProductCreate`` and writes it in batches: one pre-check query per batch,
+then multi-row ``INSERT ... ON CONFLICT (slug) DO UPDATE`` statements and
+one commit. A row whose slug is new but whose SKU already exists updates
+that product (and renames its slug). Bad rows are reported and skipped
+without failing their batch, as is a row overridden by a later row with the
+same slug in its batch. Only the current batch is held in memory.
+
+Only the columns present in a row are written on update. A row that is not
+a complete product (say a file with just ``slug,price,stock_quantity``) is
+validated with ``ProductImportUpdate`` instead and applied only when its
+slug or SKU matches an existing product, so such a file adjusts prices and
+stock in place. Empty CSV cells count as absent.
+"""
+
+import csv
+import io
+import json
+from typing import BinaryIO, Iterator, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import false, func, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import Product, Category
+from schemas import ProductCreate, ProductImportUpdate
+from counters import update_counters
+from inventory import sync_shards
+from cache import catalog_cache
+from config import settings
+
+FORMATS = ("csv", "ndjson")
+
+# Keeps the report bounded for a file full of bad rows
+MAX_REPORTED_ERRORS = 1000
+
+_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def detect_format(filename: Optional[str], fmt: Optional[str] = None) -> str:
+    """Explicit ``fmt``, or the format implied by the file extension"""
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format {fmt!r}, expected one of {', '.join(FORMATS)}")
+        return fmt
+
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return "csv"
+    if extension in ("ndjson", "jsonl"):
+        return "ndjson"
+    raise ValueError("Cannot tell the format from the file name; pass format=csv or format=ndjson")
+
+
+def _iter_records(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """(line number, record, error) for every row of ``stream``"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            for record in reader:
+                yield reader.line_num, {k: v for k, v in record.items() if k and v not in ("", None)}, None
+        else:
+            for line_number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_number, None, f"Invalid JSON: {str(e)}"
+                    continue
+                if not isinstance(record, dict):
+                    yield line_number, None, "Expected a JSON object"
+                    continue
+                yield line_number, record, None
+    finally:
+        # Leave the caller's stream open
+        text.detach()
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def _fail(result: dict, row: Optional[int], message: str):
+    result["failed"] += 1
+    if len(result["errors"]) < MAX_REPORTED_ERRORS:
+        result["errors"].append({"row": row, "error": message})
+    else:
+        result["errors_truncated"] = True
+
+
+def _upsert(db: Session, rows: list):
+    """Multi-row INSERT ... ON CONFLICT (slug) DO UPDATE, one statement per column set"""
+    insert = _INSERTS[db.get_bind().dialect.name]
+    groups = {}
+    for values in rows:
+        groups.setdefault(tuple(sorted(values)), []).append(values)
+
+    for columns, group in groups.items():
+        statement = insert(Product).values(group)
+        set_ = {column: statement.excluded[column] for column in columns if column != "slug"}
+        set_["updated_at"] = func.now()
+        db.execute(statement.on_conflict_do_update(index_elements=[Product.slug], set_=set_))
+
+
+def _apply_batch(db: Session, batch: list, result: dict):
+    # Later rows win within a batch, as they do across batches; the rows
+    # they replace are reported so every row is accounted for
+    by_slug = {}
+    for row, values, create_error in batch:
+        superseded = by_slug.get(values["slug"])
+        if superseded is not None:
+            _fail(result, superseded[0], f"Superseded by row {row} with the same slug")
+        by_slug[values["slug"]] = (row, values, create_error)
+    rows = list(by_slug.values())
+
+    slugs = list(by_slug)
+    skus = [values["sku"] for _, values, _ in rows if values.get("sku")]
+    id_by_slug = {}
+    owner_by_sku = {}
+    for product_id, slug, sku in db.query(Product.id, Product.slug, Product.sku).filter(
+        or_(Product.slug.in_(slugs), Product.sku.in_(skus) if skus else false())
+    ):
+        id_by_slug[slug] = product_id
+        if sku:
+            owner_by_sku[sku] = (product_id, slug)
+
+    category_ids = {values["category_id"] for _, values, _ in rows if values.get("category_id") is not None}
+    known_categories = {
+        category_id for (category_id,) in db.query(Category.id).filter(Category.id.in_(category_ids))
+    } if category_ids else set()
+
+    upserts, updates = [], []
+    sku_rows = {}
+    for row, values, create_error in rows:
+        category_id = values.get("category_id")
+        if category_id is not None and category_id not in known_categories:
+            _fail(result, row, f"Category {category_id} does not exist")
+            continue
+
+        product_id = id_by_slug.get(values["slug"])
+        sku = values.get("sku")
+        owner = owner_by_sku.get(sku) if sku else None
+        if create_error is not None and product_id is None and owner is None:
+            # Not a complete product and nothing to update
+            _fail(result, row, create_error)
+            continue
+        if sku:
+            if sku in sku_rows:
+                _fail(result, row, f"SKU {sku} is also used by row {sku_rows[sku]}")
+                continue
+            if owner is not None and product_id is not None and owner[0] != product_id:
+                _fail(result, row, f"SKU {sku} already belongs to product {owner[1]}")
+                continue
+            sku_rows[sku] = row
+            if owner is not None and product_id is None:
+                # Matched on SKU: update that product, including its slug
+                updates.append((row, {"id": owner[0], **values}))
+                continue
+        if create_error is not None:
+            # Partial rows never insert: the INSERT half of an upsert needs every column
+            updates.append((row, {"id": product_id, **values}))
+            continue
+        upserts.append((row, values, product_id is None))
+
+    try:
+        with db.begin_nested():
+            if upserts:
+                _upsert(db, [values for _, values, _ in upserts])
+            if updates:
+                db.execute(update(Product), [values for _, values in updates])
+        written = [(row, created) for row, _, created in upserts] + [(row, False) for row, _ in updates]
+    except IntegrityError:
+        # A concurrent write the pre-check could not see: retry row by row to find it
+        written = []
+        for row, values, created in upserts:
+            try:
+                with db.begin_nested():
+                    _upsert(db, [values])
+                written.append((row, created))
+            except IntegrityError as e:
+                _fail(result, row, str(e.orig))
+        for row, values in updates:
+            try:
+                with db.begin_nested():
+                    db.execute(update(Product), [values])
+                written.append((row, False))
+            except IntegrityError as e:
+                _fail(result, row, str(e.orig))
+
+    # Sharded products keep their stock in the shards
+    restocked = [values["id"] for _, values in updates if "stock_quantity" in values]
+    restocked += [
+        id_by_slug[values["slug"]] for _, values, created in upserts
+        if not created and "stock_quantity" in values
+    ]
+    sync_shards(db, restocked)
+
+    created = sum(1 for _, is_new in written if is_new)
+    result["created"] += created
+    result["updated"] += len(written) - created
+    update_counters(db, total_products=created)
+    db.commit()
+
+
+def import_products(db: Session, stream: BinaryIO, fmt: str, batch_size: Optional[int] = None) -> dict:
+    """Create or update products from a CSV/NDJSON byte stream, committing each batch"""
+    batch_size = batch_size or settings.PRODUCT_IMPORT_BATCH_SIZE
+    result = {
+        "processed": 0,
+        "created": 0,
+        "updated": 0,
+        "failed": 0,
+        "errors": [],
+        "errors_truncated": False,
+        "aborted": None,
+    }
+
+    batch = []
+    try:
+        for row, record, error in _iter_records(stream, fmt):
+            result["processed"] += 1
+            if error:
+                _fail(result, row, error)
+                continue
+            create_error = None
+            try:
+                values = ProductCreate.model_validate(record).model_dump(exclude_unset=True)
+            except ValidationError as e:
+                # Maybe an update of an existing product; the batch checks that
+                create_error = _describe(e)
+                try:
+                    values = ProductImportUpdate.model_validate(record).model_dump(exclude_unset=True)
+                except ValidationError:
+                    _fail(result, row, create_error)
+                    continue
+
+            batch.append((row, values, create_error))
+            if len(batch) >= batch_size:
+                _apply_batch(db, batch, result)
+                batch = []
+
+        if batch:
+            _apply_batch(db, batch, result)
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Batches already committed stay; the report says where reading stopped
+        db.rollback()
+        result["aborted"] = f"Could not read the file after {result['processed']} rows: {str(e)}"
+    finally:
+        if result["created"] or result["updated"]:
+            catalog_cache.invalidate("products")
+
+    return result
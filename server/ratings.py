@@ -0,0 +1,161 @@
+"""
+Per-product rating summaries
+
+``product_rating_summaries`` holds the review count, rating sum and 1-5
+histogram for every reviewed product so the rating endpoint is a single
+primary key read. The review routes update it in the same transaction as
+the review itself; ``rebuild_all_rating_summaries`` corrects any drift.
+"""
+
+from collections import defaultdict
+from typing import Iterable, Optional
+from sqlalchemy import case, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import ProductReview, ProductRatingSummary
+
+RATING_VALUES = range(1, 6)
+
+
+def _aggregate_columns():
+    return [
+        func.count(ProductReview.id),
+        func.coalesce(func.sum(ProductReview.rating), 0),
+        *[
+            func.coalesce(func.sum(case((ProductReview.rating == rating, 1), else_=0)), 0)
+            for rating in RATING_VALUES
+        ],
+    ]
+
+
+def _apply_aggregate(summary: ProductRatingSummary, row):
+    summary.total_reviews = row[0]
+    summary.rating_sum = row[1]
+    for rating, count in zip(RATING_VALUES, row[2:]):
+        setattr(summary, f"rating_{rating}", count)
+
+
+def record_rating_change(
+    db: Session,
+    product_id: int,
+    added: Optional[int] = None,
+    removed: Optional[int] = None
+):
+    """Apply a review insert (``added``), delete (``removed``) or rating change (both).
+
+    Runs as one atomic ``UPDATE ... SET col = col + n`` inside the caller's
+    transaction, so concurrent reviews never lose an increment. Pending
+    review changes must already be flushed.
+    """
+    deltas = defaultdict(int)
+    if added is not None:
+        deltas["total_reviews"] += 1
+        deltas["rating_sum"] += added
+        deltas[f"rating_{added}"] += 1
+    if removed is not None:
+        deltas["total_reviews"] -= 1
+        deltas["rating_sum"] -= removed
+        deltas[f"rating_{removed}"] -= 1
+
+    values = {
+        name: getattr(ProductRatingSummary, name) + delta
+        for name, delta in deltas.items() if delta
+    }
+    if not values:
+        return
+
+    increment = (
+        update(ProductRatingSummary)
+        .where(ProductRatingSummary.product_id == product_id)
+        .values(**values)
+    )
+    if db.execute(increment).rowcount:
+        return
+
+    # First review of this product, or a summary lost to drift
+    if not _create_summary(db, product_id, _aggregate(db, product_id)):
+        # A concurrent first review created it from what it could see, which
+        # is not our uncommitted change; add ours to its row
+        db.execute(increment)
+
+
+def _aggregate(db: Session, product_id: int):
+    return db.query(*_aggregate_columns()).filter(ProductReview.product_id == product_id).one()
+
+
+def _create_summary(db: Session, product_id: int, row) -> bool:
+    """Insert the product's summary; False if a concurrent request inserted it first"""
+    summary = ProductRatingSummary(product_id=product_id)
+    _apply_aggregate(summary, row)
+    try:
+        with db.begin_nested():
+            db.add(summary)
+    except IntegrityError:
+        return False
+    return True
+
+
+def rebuild_rating_summary(db: Session, product_id: int):
+    """Recompute one product's summary from its reviews"""
+    row = _aggregate(db, product_id)
+
+    summary = db.get(ProductRatingSummary, product_id)
+    if summary is None:
+        if _create_summary(db, product_id, row):
+            return
+        # A concurrent request created it first; count again now that its
+        # review has committed
+        row = _aggregate(db, product_id)
+        summary = db.get(ProductRatingSummary, product_id)
+
+    _apply_aggregate(summary, row)
+    db.flush()
+
+
+def rebuild_rating_summaries(db: Session, product_ids: Iterable[int]):
+    for product_id in set(product_ids):
+        rebuild_rating_summary(db, product_id)
+
+
+def attach_rating_summaries(db: Session, products: list):
+    """Set ``average_rating`` and ``total_reviews`` on every product with one query"""
+    if not products:
+        return
+    summaries = {
+        summary.product_id: summary
+        for summary in db.query(ProductRatingSummary).filter(
+            ProductRatingSummary.product_id.in_([product.id for product in products])
+        )
+    }
+    for product in products:
+        summary = summaries.get(product.id)
+        product.average_rating = round(summary.average_rating, 1) if summary else 0.0
+        product.total_reviews = summary.total_reviews if summary else 0
+
+
+def rebuild_all_rating_summaries(db: Session) -> int:
+    """Recompute every summary with one grouped scan; returns the number corrected"""
+    rows = {
+        row[0]: row[1:]
+        for row in db.query(ProductReview.product_id, *_aggregate_columns())
+        .group_by(ProductReview.product_id)
+    }
+    summaries = {summary.product_id: summary for summary in db.query(ProductRatingSummary)}
+
+    corrected = 0
+    for product_id in rows.keys() | summaries.keys():
+        row = rows.get(product_id, (0, 0, 0, 0, 0, 0, 0))
+        summary = summaries.get(product_id)
+        if summary is None:
+            summary = ProductRatingSummary(product_id=product_id)
+            db.add(summary)
+        current = (
+            summary.total_reviews, summary.rating_sum,
+            *[getattr(summary, f"rating_{rating}") for rating in RATING_VALUES]
+        )
+        if current != tuple(row):
+            _apply_aggregate(summary, row)
+            corrected += 1
+
+    db.commit()
+    return corrected
@@ -1,19 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from typing import Optional
 from database import get_db
 from models import AboutPage, User
 from schemas import AboutPageCreate, AboutPageUpdate, AboutPageResponse
 from auth import get_current_admin_user
+from cache import catalog_cache
+from serialization import ABOUT_PAGE, to_json
+from http_cache import build_entry, conditional_response
+from config import settings
 
 router = APIRouter(prefix="/api/about", tags=["About"])
 
 
 @router.get("", response_model=Optional[AboutPageResponse])
-def get_about_page(db: Session = Depends(get_db)):
+def get_about_page(request: Request, db: Session = Depends(get_db)):
     """Get the about page content (public)"""
-    about = db.query(AboutPage).first()
-    return about
+    entry = catalog_cache.get("about")
+    
+    if entry is None:
+        entry = build_entry(to_json(ABOUT_PAGE, db.query(AboutPage).first()))
+        catalog_cache.set("about", entry, tags=["about"])
+    
+    return conditional_response(request, entry, settings.HTTP_CACHE_CONTENT)
 
 
 @router.post("", response_model=AboutPageResponse, status_code=status.HTTP_201_CREATED)
@@ -35,6 +44,7 @@ def create_about_page(
     db.add(db_about)
     db.commit()
     db.refresh(db_about)
+    catalog_cache.invalidate("about")
     return db_about
 
 
@@ -57,6 +67,7 @@ def update_about_page(
     
     db.commit()
     db.refresh(db_about)
+    catalog_cache.invalidate("about")
     return db_about
 
 
@@ -72,4 +83,5 @@ def delete_about_page(
     
     db.delete(db_about)
     db.commit()
+    catalog_cache.invalidate("about")
     return None
@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from database import get_db
-from models import User, Product, Order, OrderStatus
-from schemas import DashboardStats
-from auth import get_current_admin_user
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+from database import get_db, db_pool_stats
+from models import User, OrderStatus, Product
+from schemas import DashboardStats, AnalyticsResponse, ProductImportResult, StockStatus
+from counters import read_counters, count_low_stock
+from analytics import get_analytics, backfill_rollups
+from auth import get_current_admin_user, password_hash_stats, principal_cache
+from cache import catalog_cache
+from scheduler import scheduler_status
+from product_import import detect_format, import_products
+from export import MEDIA_TYPES, export_orders, export_products
+from inventory import set_shards, stock_status
+from config import settings
 
 router = APIRouter(prefix="/api/admin", tags=["Admin"])
 
@@ -14,33 +24,185 @@ def get_dashboard_stats(
     current_user: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    # Total orders
-    total_orders = db.query(func.count(Order.id)).scalar()
-    
-    # Total revenue
-    total_revenue = db.query(func.sum(Order.total_amount)).scalar() or 0
-    
-    # Total products
-    total_products = db.query(func.count(Product.id)).scalar()
-    
-    # Total customers (non-admin users)
-    total_customers = db.query(func.count(User.id)).filter(User.role == "customer").scalar()
-    
-    # Pending orders
-    pending_orders = db.query(func.count(Order.id)).filter(
-        Order.status == OrderStatus.PENDING
-    ).scalar()
+    # Totals come from the maintained counters, not from scanning the tables
+    counters = read_counters(db)
     
     # Low stock products (less than 10 items)
-    low_stock_products = db.query(func.count(Product.id)).filter(
-        Product.stock_quantity < 10
-    ).scalar()
+    low_stock_products = count_low_stock(db)
     
     return DashboardStats(
-        total_orders=total_orders,
-        total_revenue=float(total_revenue),
-        total_products=total_products,
-        total_customers=total_customers,
-        pending_orders=pending_orders,
+        total_orders=int(counters["total_orders"]),
+        total_revenue=float(counters["total_revenue"]),
+        total_products=int(counters["total_products"]),
+        total_customers=int(counters["total_customers"]),
+        pending_orders=int(counters["pending_orders"]),
         low_stock_products=low_stock_products
     )
+
+
+@router.get("/analytics", response_model=AnalyticsResponse)
+def get_sales_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: str = Query("day", pattern="^(hour|day)$"),
+    top: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Revenue, orders and units over [start, end) from the sales rollups (UTC).
+
+    Defaults to the last 30 days. Rollups trail live orders by up to
+    ANALYTICS_ROLLUP_MINUTES.
+    """
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    
+    return get_analytics(db, start, end, granularity, top)
+
+
+@router.post("/analytics/backfill")
+def backfill_sales_analytics(
+    start: datetime,
+    end: datetime,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Recompute the rollups for [start, end), at most ANALYTICS_BACKFILL_MAX_DAYS.
+
+    The range is bounded so the request finishes well within proxy and
+    serverless timeouts; ``python manage.py backfill-rollups`` recomputes
+    longer ranges and all history.
+    """
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    if end - start > timedelta(days=settings.ANALYTICS_BACKFILL_MAX_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                f"Backfill at most {settings.ANALYTICS_BACKFILL_MAX_DAYS} days per request; "
+                "use python manage.py backfill-rollups for longer ranges"
+            )
+        )
+    
+    days = backfill_rollups(db, start, end)
+    return {"days": days}
+
+
+@router.post("/products/import", response_model=ProductImportResult)
+def import_product_catalog(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    batch_size: Optional[int] = Query(None, ge=1, le=10000),
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Create or update products from a CSV or NDJSON upload, matched on slug then SKU.
+
+    Rows that fail validation are listed in ``errors``; every other row is
+    written. The format defaults to the file extension.
+    """
+    try:
+        fmt = detect_format(file.filename, format)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return import_products(db, file.file, fmt, batch_size)
+
+
+def _export_response(body: Iterator[bytes], name: str, fmt: str) -> StreamingResponse:
+    filename = f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/export/orders")
+def export_order_history(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status_filter: Optional[List[OrderStatus]] = Query(None),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Stream orders created in [start, end), optionally only the given statuses.
+
+    CSV has one row per order line; NDJSON one object per order with ``items``.
+    """
+    body = export_orders(format, start=start, end=end, statuses=status_filter)
+    return _export_response(body, "orders", format)
+
+
+@router.get("/export/products")
+def export_product_catalog(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    is_active: Optional[bool] = None,
+    category_id: Optional[int] = None,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Stream products, optionally created in [start, end)"""
+    body = export_products(format, start=start, end=end, is_active=is_active, category_id=category_id)
+    return _export_response(body, "products", format)
+
+
+def _get_product(db: Session, product_id: int) -> Product:
+    product = db.query(Product).filter(Product.id == product_id).first()
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+    return product
+
+
+@router.get("/inventory/{product_id}", response_model=StockStatus)
+def get_stock_status(
+    product_id: int,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Available and reserved stock of a product, per shard when sharded"""
+    return stock_status(db, _get_product(db, product_id))
+
+
+@router.put("/inventory/{product_id}/shards", response_model=StockStatus)
+def set_stock_shards(
+    product_id: int,
+    shards: int = Query(..., ge=0, le=64),
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Split a hot product's stock over ``shards`` rows so buyers do not queue on one; 0 folds it back"""
+    product = _get_product(db, product_id)
+    set_shards(db, product, shards)
+    db.commit()
+    return stock_status(db, product)
+
+
+@router.get("/metrics")
+def get_metrics(
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Operational metrics for this worker"""
+    return {
+        "password_hashing": password_hash_stats(),
+        "catalog_cache": catalog_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "db_pool": db_pool_stats(),
+        "scheduler": scheduler_status(db),
+    }
@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from database import get_async_db
 from models import User, UserRole
 from schemas import UserCreate, UserLogin, UserResponse, Token, PasswordReset, PasswordResetConfirm
 from auth import (
-    get_password_hash, verify_password, create_access_token,
+    get_password_hash_async, verify_password_async, create_access_token,
     create_refresh_token, create_verification_token, decode_token,
-    get_current_user, get_current_active_user
+    get_current_user, get_current_active_user, invalidate_principal
 )
-from email_service import send_verification_email, send_password_reset_email
+from email_service import enqueue_email
+from scheduler import wake_email_outbox
+from counters import update_counters
 import logging
 
 # Set up logging
@@ -20,11 +24,12 @@ router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user and send verification email"""
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    result = await db.execute(select(User).where(User.email == user_data.email))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -36,11 +41,15 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     logger.info(f"Creating new user with email: {user_data.email}")
     logger.info(f"Verification token: {verification_token}")
     
+    # Hand the pooled connection back while bcrypt runs
+    await db.rollback()
+    hashed_password = await get_password_hash_async(user_data.password)
+    
     # Create new user
     new_user = User(
         email=user_data.email,
         full_name=user_data.full_name,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=hashed_password,
         role=UserRole.CUSTOMER,
         is_active=True,
         is_verified=False,
@@ -48,47 +57,48 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    # Queued with the user so neither exists without the other
+    enqueue_email(db, "verification", new_user.email, token=verification_token)
+    await db.run_sync(update_counters, total_customers=1)
+    await db.commit()
+    await db.refresh(new_user)
+    wake_email_outbox()
     
     logger.info(f"User created successfully: {new_user.id}")
     
-    # Send verification email
-    try:
-        await send_verification_email(new_user.email, verification_token)
-        logger.info(f"Verification email sent to {new_user.email}")
-    except Exception as e:
-        logger.error(f"Failed to send verification email: {str(e)}")
-        # Don't fail registration if email fails, but log the error
-        # The user can request a resend later
-        logger.warning(f"User registered but verification email failed for {new_user.email}")
-    
     return new_user
 
 
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Login user and return access token"""
-    user = db.query(User).filter(User.email == form_data.username).first()
+    result = await db.execute(select(User).where(User.email == form_data.username))
+    user = result.scalars().first()
+    # Read everything needed now; the rollback below expires the instance
+    hashed_password = user.hashed_password if user else None
+    is_active = user.is_active if user else False
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # Hand the pooled connection back while bcrypt runs
+    await db.rollback()
+    
+    if not user or not await verify_password_async(form_data.password, hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not user.is_active:
+    if not is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Account is inactive"
         )
     
-    access_token = create_access_token(data={"sub": user.email})
-    refresh_token = create_refresh_token(data={"sub": user.email})
+    access_token = create_access_token(data={"sub": form_data.username})
+    refresh_token = create_refresh_token(data={"sub": form_data.username})
     
     return {
         "access_token": access_token,
@@ -98,11 +108,12 @@ async def login(
 
 
 @router.post("/verify-email")
-async def verify_email(token: str, db: Session = Depends(get_db)):
+async def verify_email(token: str, db: AsyncSession = Depends(get_async_db)):
     """Verify user email with token"""
     logger.info(f"Verifying email with token: {token}")
     
-    user = db.query(User).filter(User.verification_token == token).first()
+    result = await db.execute(select(User).where(User.verification_token == token))
+    user = result.scalars().first()
     
     if not user:
         logger.error(f"Invalid verification token: {token}")
@@ -111,18 +122,22 @@ async def verify_email(token: str, db: Session = Depends(get_db)):
             detail="Invalid verification token"
         )
     
+    email = user.email
     user.is_verified = True
     user.verification_token = None
-    db.commit()
+    await db.commit()
+    # Publishes to Redis, a blocking call
+    await run_in_threadpool(invalidate_principal, email)
     
-    logger.info(f"Email verified successfully for user: {user.email}")
+    logger.info(f"Email verified successfully for user: {email}")
     return {"message": "Email verified successfully"}
 
 
 @router.post("/resend-verification")
-async def resend_verification(email: str, db: Session = Depends(get_db)):
+async def resend_verification(email: str, db: AsyncSession = Depends(get_async_db)):
     """Resend verification email"""
-    user = db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
     
     if not user:
         raise HTTPException(
@@ -138,25 +153,19 @@ async def resend_verification(email: str, db: Session = Depends(get_db)):
     
     verification_token = create_verification_token()
     user.verification_token = verification_token
-    db.commit()
-    
-    try:
-        await send_verification_email(user.email, verification_token)
-        logger.info(f"Verification email resent to {user.email}")
-    except Exception as e:
-        logger.error(f"Failed to resend verification email: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to send verification email: {str(e)}"
-        )
+    enqueue_email(db, "verification", email, token=verification_token)
+    await db.commit()
+    wake_email_outbox()
     
+    logger.info(f"Verification email queued for {email}")
     return {"message": "Verification email sent"}
 
 
 @router.post("/forgot-password")
-async def forgot_password(data: PasswordReset, db: Session = Depends(get_db)):
+async def forgot_password(data: PasswordReset, db: AsyncSession = Depends(get_async_db)):
     """Send password reset email"""
-    user = db.query(User).filter(User.email == data.email).first()
+    result = await db.execute(select(User).where(User.email == data.email))
+    user = result.scalars().first()
     
     if not user:
         # Don't reveal if email exists
@@ -164,21 +173,19 @@ async def forgot_password(data: PasswordReset, db: Session = Depends(get_db)):
     
     reset_token = create_verification_token()
     user.reset_token = reset_token
-    db.commit()
-    
-    try:
-        await send_password_reset_email(user.email, reset_token)
-        logger.info(f"Password reset email sent to {user.email}")
-    except Exception as e:
-        logger.error(f"Failed to send password reset email: {str(e)}")
+    enqueue_email(db, "password_reset", data.email, token=reset_token)
+    await db.commit()
+    wake_email_outbox()
     
+    logger.info(f"Password reset email queued for {data.email}")
     return {"message": "If the email exists, a reset link will be sent"}
 
 
 @router.post("/reset-password")
-async def reset_password(data: PasswordResetConfirm, db: Session = Depends(get_db)):
+async def reset_password(data: PasswordResetConfirm, db: AsyncSession = Depends(get_async_db)):
     """Reset password with token"""
-    user = db.query(User).filter(User.reset_token == data.token).first()
+    result = await db.execute(select(User.id, User.email).where(User.reset_token == data.token))
+    user = result.first()
     
     if not user:
         raise HTTPException(
@@ -186,9 +193,24 @@ async def reset_password(data: PasswordResetConfirm, db: Session = Depends(get_d
             detail="Invalid reset token"
         )
     
-    user.hashed_password = get_password_hash(data.new_password)
-    user.reset_token = None
-    db.commit()
+    # Hand the pooled connection back while bcrypt runs
+    await db.rollback()
+    hashed_password = await get_password_hash_async(data.new_password)
+    
+    # Still conditional on the token so it can only be used once
+    result = await db.execute(
+        update(User)
+        .where(User.id == user.id, User.reset_token == data.token)
+        .values(hashed_password=hashed_password, reset_token=None)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid reset token"
+        )
+    await db.commit()
+    await run_in_threadpool(invalidate_principal, user.email)
     
     logger.info(f"Password reset successfully for user: {user.email}")
     return {"message": "Password reset successfully"}
@@ -201,7 +223,7 @@ async def get_me(current_user: User = Depends(get_current_active_user)):
 
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
+async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_async_db)):
     """Refresh access token"""
     payload = decode_token(refresh_token)
     
@@ -212,7 +234,8 @@ async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
         )
     
     email = payload.get("sub")
-    user = db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User.email).where(User.email == email))
+    user = result.first()
     
     if not user:
         raise HTTPException(
@@ -2,20 +2,81 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
-from models import CartItem, Product, User
-from schemas import CartItemCreate, CartItemUpdate, CartItemResponse
+from models import Product, User
+from schemas import CartItemCreate, CartItemUpdate, CartItemResponse, CartSync
 from auth import get_current_verified_user
+from cart_store import get_cart_store
+from serialization import CART_ITEM_LIST, to_json, json_response
+from inventory import reservation_mode, set_reservations
 
 router = APIRouter(prefix="/api/cart", tags=["Cart"])
 
 
+def _reserve(db: Session, user_id: int, quantities: dict, replace: bool = False):
+    """In "cart" reservation mode, hold stock for what is in the cart"""
+    if reservation_mode() != "cart":
+        return
+    if set_reservations(db, user_id, quantities, replace):
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Insufficient stock"
+        )
+
+
 @router.get("/", response_model=List[CartItemResponse])
 def get_cart(
     current_user: User = Depends(get_current_verified_user),
     db: Session = Depends(get_db)
 ):
-    cart_items = db.query(CartItem).filter(CartItem.user_id == current_user.id).all()
-    return cart_items
+    cart_items = get_cart_store().lines(db, current_user.id)
+    return json_response(to_json(CART_ITEM_LIST, cart_items))
+
+
+@router.put("/", response_model=List[CartItemResponse])
+def sync_cart(
+    cart_data: CartSync,
+    current_user: User = Depends(get_current_verified_user),
+    db: Session = Depends(get_db)
+):
+    """Replace the cart with ``items`` in one transaction, e.g. a guest cart after login.
+
+    The same product listed twice is one line with the summed quantity.
+    Returns the resulting cart.
+    """
+    quantities = {}
+    for item in cart_data.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    
+    # Every product in one query
+    products = {
+        product.id: product
+        for product in db.query(Product).filter(Product.id.in_(list(quantities)))
+    } if quantities else {}
+    missing = [product_id for product_id in quantities if product_id not in products]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Products not found: {', '.join(str(product_id) for product_id in missing)}"
+        )
+    
+    if reservation_mode() != "cart":
+        short = [
+            product.name for product_id, product in products.items()
+            if product.stock_quantity < quantities[product_id]
+        ]
+        if short:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient stock for {', '.join(short)}"
+            )
+    
+    store = get_cart_store()
+    _reserve(db, current_user.id, quantities, replace=True)
+    store.replace(db, current_user.id, quantities)
+    db.commit()
+    
+    return json_response(to_json(CART_ITEM_LIST, store.lines(db, current_user.id)))
 
 
 @router.post("/", response_model=CartItemResponse, status_code=status.HTTP_201_CREATED)
@@ -32,42 +93,22 @@ def add_to_cart(
             detail="Product not found"
         )
     
-    # Check if product is in stock
-    if product.stock_quantity < cart_data.quantity:
+    # Add to what is already in the cart
+    store = get_cart_store()
+    quantity = store.quantities(db, current_user.id).get(product.id, 0) + cart_data.quantity
+    
+    # Check if product is in stock; a reservation checks for itself
+    if reservation_mode() != "cart" and product.stock_quantity < quantity:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Insufficient stock"
         )
     
-    # Check if item already in cart
-    existing_item = db.query(CartItem).filter(
-        CartItem.user_id == current_user.id,
-        CartItem.product_id == cart_data.product_id
-    ).first()
-    
-    if existing_item:
-        # Update quantity
-        existing_item.quantity += cart_data.quantity
-        if product.stock_quantity < existing_item.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Insufficient stock"
-            )
-        db.commit()
-        db.refresh(existing_item)
-        return existing_item
-    
-    # Create new cart item
-    new_cart_item = CartItem(
-        user_id=current_user.id,
-        product_id=cart_data.product_id,
-        quantity=cart_data.quantity
-    )
-    db.add(new_cart_item)
+    _reserve(db, current_user.id, {product.id: quantity})
+    cart_item = store.add_quantity(db, current_user.id, product.id, cart_data.quantity)
     db.commit()
-    db.refresh(new_cart_item)
     
-    return new_cart_item
+    return cart_item
 
 
 @router.put("/{cart_item_id}", response_model=CartItemResponse)
@@ -77,10 +118,8 @@ def update_cart_item(
     current_user: User = Depends(get_current_verified_user),
     db: Session = Depends(get_db)
 ):
-    cart_item = db.query(CartItem).filter(
-        CartItem.id == cart_item_id,
-        CartItem.user_id == current_user.id
-    ).first()
+    store = get_cart_store()
+    cart_item = store.line(db, current_user.id, cart_item_id)
     
     if not cart_item:
         raise HTTPException(
@@ -89,16 +128,16 @@ def update_cart_item(
         )
     
     # Check stock
-    product = db.query(Product).filter(Product.id == cart_item.product_id).first()
-    if product.stock_quantity < cart_data.quantity:
+    product = cart_item.product
+    if reservation_mode() != "cart" and product.stock_quantity < cart_data.quantity:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Insufficient stock"
         )
     
-    cart_item.quantity = cart_data.quantity
+    _reserve(db, current_user.id, {product.id: cart_data.quantity})
+    cart_item = store.set_quantity(db, current_user.id, product.id, cart_data.quantity)
     db.commit()
-    db.refresh(cart_item)
     
     return cart_item
 
@@ -109,10 +148,8 @@ def remove_from_cart(
     current_user: User = Depends(get_current_verified_user),
     db: Session = Depends(get_db)
 ):
-    cart_item = db.query(CartItem).filter(
-        CartItem.id == cart_item_id,
-        CartItem.user_id == current_user.id
-    ).first()
+    store = get_cart_store()
+    cart_item = store.line(db, current_user.id, cart_item_id)
     
     if not cart_item:
         raise HTTPException(
@@ -120,7 +157,8 @@ def remove_from_cart(
             detail="Cart item not found"
         )
     
-    db.delete(cart_item)
+    _reserve(db, current_user.id, {cart_item.product_id: 0})
+    store.set_quantity(db, current_user.id, cart_item.product_id, 0)
     db.commit()
     
     return None
@@ -131,7 +169,8 @@ def clear_cart(
     current_user: User = Depends(get_current_verified_user),
     db: Session = Depends(get_db)
 ):
-    db.query(CartItem).filter(CartItem.user_id == current_user.id).delete()
+    _reserve(db, current_user.id, {}, replace=True)
+    get_cart_store().clear(db, current_user.id)
     db.commit()
     
     return None
@@ -1,35 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from database import get_db, get_async_db
 from models import Category, User
 from schemas import CategoryCreate, CategoryUpdate, CategoryResponse
 from auth import get_current_admin_user
+from pagination import seek_by_id, fetch_page, NEXT_CURSOR_HEADER
+from cache import catalog_cache, make_key
+from serialization import CATEGORY, CATEGORY_LIST, to_json
+from http_cache import build_entry, conditional_response
+from config import settings
 
 router = APIRouter(prefix="/api/categories", tags=["Categories"])
 
 
 @router.get("/", response_model=List[CategoryResponse])
-def get_categories(
+async def get_categories(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    categories = db.query(Category).offset(skip).limit(limit).all()
-    return categories
+    cache_key = make_key("categories:list", skip=skip, limit=limit, cursor=cursor)
+    # Cache calls block on Redis, so they run in the threadpool
+    page = await run_in_threadpool(catalog_cache.get, cache_key)
+    
+    if page is None:
+        page = await db.run_sync(_categories_page, response, skip, limit, cursor)
+        await run_in_threadpool(catalog_cache.set, cache_key, page, tags=["categories"])
+    
+    return conditional_response(request, page, settings.HTTP_CACHE_CATEGORIES)
+
+
+def _categories_page(db: Session, response: Response, skip: int, limit: int, cursor: Optional[str]):
+    query = seek_by_id(db.query(Category), Category.id, cursor).offset(skip)
+    categories = fetch_page(query, limit, response, lambda category: (category.id,))
+    return build_entry(to_json(CATEGORY_LIST, categories), response.headers.get(NEXT_CURSOR_HEADER))
+
+
+def _category_entry(db: Session, category_id: int):
+    db_category = db.query(Category).filter(Category.id == category_id).first()
+    return build_entry(to_json(CATEGORY, db_category)) if db_category is not None else None
 
 
 @router.get("/{category_id}", response_model=CategoryResponse)
-def get_category(category_id: int, db: Session = Depends(get_db)):
-    category = db.query(Category).filter(Category.id == category_id).first()
+async def get_category(category_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    cache_key = f"categories:id:{category_id}"
+    entry = await run_in_threadpool(catalog_cache.get, cache_key)
     
-    if not category:
+    if entry is None:
+        entry = await db.run_sync(_category_entry, category_id)
+        if entry is not None:
+            await run_in_threadpool(catalog_cache.set, cache_key, entry, tags=["categories"])
+    
+    if entry is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Category not found"
         )
     
-    return category
+    return conditional_response(request, entry, settings.HTTP_CACHE_CATEGORIES)
 
 
 @router.post("/", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
@@ -51,6 +85,7 @@ def create_category(
     db.add(new_category)
     db.commit()
     db.refresh(new_category)
+    catalog_cache.invalidate("categories")
     
     return new_category
 
@@ -78,6 +113,8 @@ def update_category(
     
     db.commit()
     db.refresh(category)
+    # Products embed their category
+    catalog_cache.invalidate("categories", "products")
     
     return category
 
@@ -98,5 +135,6 @@ def delete_category(
     
     db.delete(category)
     db.commit()
+    catalog_cache.invalidate("categories", "products")
     
     return None
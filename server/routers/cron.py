@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Header, HTTPException, status
+from typing import Optional
+from scheduler import run_jobs
+from config import settings
+import secrets
+
+router = APIRouter(prefix="/api/cron", tags=["Cron"])
+
+
+@router.get("/jobs")
+def run_scheduled_jobs(authorization: Optional[str] = Header(None)):
+    """Run the background jobs once, for deployments with STARTUP_SCHEDULER=false.
+
+    Needs ``Authorization: Bearer <CRON_SECRET>``, which Vercel Cron sends
+    by itself; not found while CRON_SECRET is unset.
+    """
+    if not settings.CRON_SECRET:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    
+    if not secrets.compare_digest(authorization or "", f"Bearer {settings.CRON_SECRET}"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid cron secret"
+        )
+    
+    return run_jobs()
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 from database import get_db
 from models import HandcraftPhoto, User, UserRole
 from auth import get_current_user
-from pydantic import BaseModel
+from cache import catalog_cache
+from serialization import to_json
+from http_cache import build_entry, conditional_response
+from config import settings
+from pydantic import BaseModel, TypeAdapter
 
 router = APIRouter(prefix="/api/handcraft-photos", tags=["handcraft-photos"])
 
@@ -37,11 +41,20 @@ class HandcraftPhotoResponse(BaseModel):
         from_attributes = True
 
 
+HANDCRAFT_PHOTO_LIST = TypeAdapter(List[HandcraftPhotoResponse])
+
+
 @router.get("", response_model=List[HandcraftPhotoResponse])
-def get_handcraft_photos(db: Session = Depends(get_db)):
+def get_handcraft_photos(request: Request, db: Session = Depends(get_db)):
     """Get all handcraft photos ordered by order_index"""
-    photos = db.query(HandcraftPhoto).order_by(HandcraftPhoto.order_index).all()
-    return photos
+    entry = catalog_cache.get("handcraft_photos")
+    
+    if entry is None:
+        photos = db.query(HandcraftPhoto).order_by(HandcraftPhoto.order_index).all()
+        entry = build_entry(to_json(HANDCRAFT_PHOTO_LIST, photos))
+        catalog_cache.set("handcraft_photos", entry, tags=["handcraft_photos"])
+    
+    return conditional_response(request, entry, settings.HTTP_CACHE_CONTENT)
 
 
 @router.post("", response_model=HandcraftPhotoResponse, status_code=status.HTTP_201_CREATED)
@@ -67,6 +80,7 @@ def create_handcraft_photo(
     db.add(db_photo)
     db.commit()
     db.refresh(db_photo)
+    catalog_cache.invalidate("handcraft_photos")
     return db_photo
 
 
@@ -103,6 +117,7 @@ def update_handcraft_photo(
     
     db.commit()
     db.refresh(db_photo)
+    catalog_cache.invalidate("handcraft_photos")
     return db_photo
 
 
@@ -128,4 +143,5 @@ def delete_handcraft_photo(
     
     db.delete(db_photo)
     db.commit()
+    catalog_cache.invalidate("handcraft_photos")
     return None
@@ -1,19 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from database import get_db
 from models import HeroBanner, User
 from schemas import HeroBannerCreate, HeroBannerUpdate, HeroBannerResponse
 from auth import get_current_admin_user
+from cache import catalog_cache
+from serialization import HERO_BANNER_LIST, to_json
+from http_cache import build_entry, conditional_response
+from config import settings
 
 router = APIRouter(prefix="/api/hero-banners", tags=["Hero Banners"])
 
 
 @router.get("/active", response_model=List[HeroBannerResponse])
-def get_active_hero_banners(db: Session = Depends(get_db)):
+def get_active_hero_banners(request: Request, db: Session = Depends(get_db)):
     """Get all active hero banners for slideshow on home page"""
-    banners = db.query(HeroBanner).filter(HeroBanner.is_active == True).order_by(HeroBanner.created_at.desc()).all()
-    return banners
+    entry = catalog_cache.get("hero_banners:active")
+    
+    if entry is None:
+        banners = db.query(HeroBanner).filter(HeroBanner.is_active == True).order_by(HeroBanner.created_at.desc()).all()
+        entry = build_entry(to_json(HERO_BANNER_LIST, banners))
+        catalog_cache.set("hero_banners:active", entry, tags=["hero_banners"])
+    
+    return conditional_response(request, entry, settings.HTTP_CACHE_CONTENT)
 
 
 @router.get("", response_model=List[HeroBannerResponse])
@@ -41,6 +51,7 @@ def create_hero_banner(
     db.add(db_banner)
     db.commit()
     db.refresh(db_banner)
+    catalog_cache.invalidate("hero_banners")
     return db_banner
 
 
@@ -65,6 +76,7 @@ def update_hero_banner(
     
     db.commit()
     db.refresh(db_banner)
+    catalog_cache.invalidate("hero_banners")
     return db_banner
 
 
@@ -81,4 +93,5 @@ def delete_hero_banner(
     
     db.delete(db_banner)
     db.commit()
+    catalog_cache.invalidate("hero_banners")
     return None
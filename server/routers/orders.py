@@ -1,31 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from database import get_db
-from models import Order, OrderItem, Product, User, CartItem, OrderStatus
-from schemas import OrderCreate, OrderUpdate, OrderResponse
+from database import get_db, get_async_db
+from models import Order, User, OrderStatus
+from schemas import OrderCreate, OrderUpdate, OrderResponse, CheckoutReservation
 from auth import get_current_verified_user, get_current_admin_user
-from email_service import send_order_confirmation_email
-import random
-import string
+from scheduler import wake_email_outbox
+from pagination import seek_by_created, fetch_page, NEXT_CURSOR_HEADER
+from loaders import order_list_options, order_detail_options
+from cache import catalog_cache
+from checkout import place_order, start_checkout
+from counters import update_counters
+from analytics import rollup_day
+from serialization import ORDER_LIST, to_json, json_response
 
 router = APIRouter(prefix="/api/orders", tags=["Orders"])
 
 
-def generate_order_number():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
-
-
 @router.get("/", response_model=List[OrderResponse])
-def get_orders(
+async def get_orders(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status_filter: Optional[OrderStatus] = None,
     current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Order)
+    return await db.run_sync(_orders_page, response, skip, limit, cursor, status_filter, current_user)
+
+
+def _orders_page(
+    db: Session,
+    response: Response,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    status_filter: Optional[OrderStatus],
+    current_user: User
+):
+    query = db.query(Order).options(*order_list_options())
     
     # If not admin, only show user's own orders
     if current_user.role != "admin":
@@ -34,17 +49,22 @@ def get_orders(
     if status_filter:
         query = query.filter(Order.status == status_filter)
     
-    orders = query.order_by(desc(Order.created_at)).offset(skip).limit(limit).all()
-    return orders
+    query = seek_by_created(query, Order.created_at, Order.id, cursor).offset(skip)
+    orders = fetch_page(query, limit, response, lambda order: (order.created_at, order.id))
+    return json_response(to_json(ORDER_LIST, orders), response.headers.get(NEXT_CURSOR_HEADER))
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
-def get_order(
+async def get_order(
     order_id: int,
     current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    return await db.run_sync(_order_detail, order_id, current_user)
+
+
+def _order_detail(db: Session, order_id: int, current_user: User):
+    order = db.query(Order).options(*order_detail_options()).filter(Order.id == order_id).first()
     
     if not order:
         raise HTTPException(
@@ -62,103 +82,33 @@ def get_order(
     return order
 
 
+# Checkout stays on the threadpool: place_order's commit clears a Redis cart
+# and the cache invalidation publishes to Redis, both blocking calls
 @router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
-async def create_order(
+def create_order(
     order_data: OrderCreate,
     current_user: User = Depends(get_current_verified_user),
     db: Session = Depends(get_db)
 ):
-    if not order_data.items:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Order must contain at least one item"
-        )
-    
-    # Calculate total and validate stock
-    total_amount = 0
-    order_items_data = []
-    
-    for item in order_data.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        
-        if not product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Product with id {item.product_id} not found"
-            )
-        
-        if not product.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Product {product.name} is not available"
-            )
-        
-        if product.stock_quantity < item.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Insufficient stock for product {product.name}"
-            )
-        
-        item_total = product.price * item.quantity
-        total_amount += item_total
-        
-        order_items_data.append({
-            "product_id": product.id,
-            "quantity": item.quantity,
-            "price": product.price
-        })
-    
-    # Create order
-    order_number = generate_order_number()
-    new_order = Order(
-        order_number=order_number,
-        user_id=current_user.id,
-        status=OrderStatus.PENDING,
-        total_amount=total_amount,
-        shipping_address=order_data.shipping_address,
-        shipping_city=order_data.shipping_city,
-        shipping_postal_code=order_data.shipping_postal_code,
-        shipping_country=order_data.shipping_country,
-        customer_name=order_data.customer_name,
-        customer_email=order_data.customer_email,
-        customer_phone=order_data.customer_phone,
-        notes=order_data.notes
-    )
-    
-    db.add(new_order)
-    db.flush()
+    new_order = place_order(db, current_user, order_data)
     
-    # Create order items and update stock
-    for item_data in order_items_data:
-        order_item = OrderItem(
-            order_id=new_order.id,
-            **item_data
-        )
-        db.add(order_item)
-        
-        # Update product stock
-        product = db.query(Product).filter(Product.id == item_data["product_id"]).first()
-        product.stock_quantity -= item_data["quantity"]
+    # Product pages and the listings they appear on show the stock level
+    catalog_cache.invalidate(*[f"product:{item.product_id}" for item in new_order.order_items])
     
-    # Clear user's cart
-    db.query(CartItem).filter(CartItem.user_id == current_user.id).delete()
-    
-    db.commit()
-    db.refresh(new_order)
-    
-    # Send confirmation email
-    try:
-        await send_order_confirmation_email(
-            new_order.customer_email,
-            new_order.order_number,
-            new_order.total_amount
-        )
-    except Exception as e:
-        print(f"Failed to send order confirmation email: {str(e)}")
+    wake_email_outbox()
     
     return new_order
 
 
+@router.post("/reserve", response_model=CheckoutReservation)
+def reserve_checkout(
+    current_user: User = Depends(get_current_verified_user),
+    db: Session = Depends(get_db)
+):
+    """Start checkout: hold stock for the cart until ``expires_at``, then place the order"""
+    return start_checkout(db, current_user)
+
+
 @router.put("/{order_id}", response_model=OrderResponse)
 def update_order(
     order_id: int,
@@ -174,13 +124,16 @@ def update_order(
             detail="Order not found"
         )
     
+    was_pending = order.status == OrderStatus.PENDING
+    
     # Update order fields
     update_data = order_data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(order, key, value)
     
+    update_counters(db, pending_orders=int(order.status == OrderStatus.PENDING) - int(was_pending))
     db.commit()
-    db.refresh(order)
+    order = db.query(Order).options(*order_detail_options()).filter(Order.id == order_id).first()
     
     return order
 
@@ -201,6 +154,14 @@ def delete_order(
     
     # Delete the order (order items will be cascade deleted)
     db.delete(order)
+    update_counters(
+        db,
+        total_orders=-1,
+        total_revenue=-order.total_amount,
+        pending_orders=-1 if order.status == OrderStatus.PENDING else 0
+    )
+    # Its day may already be rolled up
+    rollup_day(db, order.created_at)
     db.commit()
     
     return None
@@ -1,25 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from database import get_db
+from database import get_db, get_async_db
 from models import Product, User
 from schemas import ProductCreate, ProductUpdate, ProductResponse
 from auth import get_current_admin_user
+from search import apply_product_search
+from pagination import seek_by_id, fetch_page, NEXT_CURSOR_HEADER
+from loaders import product_options
+from cache import catalog_cache, make_key
+from ratings import attach_rating_summaries
+from counters import update_counters
+from inventory import sync_shards
+from serialization import PRODUCT, PRODUCT_LIST, to_json
+from http_cache import build_entry, conditional_response
+from config import settings
 import json
 
 router = APIRouter(prefix="/api/products", tags=["Products"])
 
 
 @router.get("/", response_model=List[ProductResponse])
-def get_products(
+async def get_products(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     category_id: Optional[int] = None,
     is_featured: Optional[bool] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    include_ratings: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Product).filter(Product.is_active == True)
+    cache_key = make_key(
+        "products:list",
+        skip=skip, limit=limit, cursor=cursor, category_id=category_id,
+        is_featured=is_featured, search=search, include_ratings=include_ratings
+    )
+    # Cache calls block on Redis, so they run in the threadpool
+    page = await run_in_threadpool(catalog_cache.get, cache_key)
+    
+    if page is None:
+        page, product_ids = await db.run_sync(
+            _products_page, response, skip, limit, cursor,
+            category_id, is_featured, search, include_ratings
+        )
+        # Tagged per product too: a sale changes stock_quantity on the page
+        tags = ["products", *[f"product:{product_id}" for product_id in product_ids]]
+        if include_ratings:
+            tags.append("ratings")
+        await run_in_threadpool(catalog_cache.set, cache_key, page, tags=tags)
+    
+    return conditional_response(request, page, settings.HTTP_CACHE_PRODUCTS)
+
+
+def _products_page(
+    db: Session,
+    response: Response,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    category_id: Optional[int],
+    is_featured: Optional[bool],
+    search: Optional[str],
+    include_ratings: bool
+):
+    """The page's cache entry and the ids of the products on it"""
+    query = db.query(Product).options(*product_options()).filter(Product.is_active == True)
     
     if category_id:
         query = query.filter(Product.category_id == category_id)
@@ -28,39 +78,54 @@ def get_products(
         query = query.filter(Product.is_featured == is_featured)
     
     if search:
-        query = query.filter(
-            (Product.name.ilike(f"%{search}%")) | 
-            (Product.description.ilike(f"%{search}%"))
-        )
-    
-    products = query.offset(skip).limit(limit).all()
-    return products
+        # Relevance ordered results only support skip/limit paging
+        query = apply_product_search(query, search)
+        products = query.offset(skip).limit(limit).all()
+    else:
+        query = seek_by_id(query, Product.id, cursor).offset(skip)
+        products = fetch_page(query, limit, response, lambda product: (product.id,))
+    
+    if include_ratings:
+        attach_rating_summaries(db, products)
+    
+    page = build_entry(to_json(PRODUCT_LIST, products), response.headers.get(NEXT_CURSOR_HEADER))
+    return page, [product.id for product in products]
 
 
-@router.get("/{product_id}", response_model=ProductResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
+def _product_entry(db: Session, *criteria):
+    """The product's id and cache entry, or None"""
+    db_product = db.query(Product).options(*product_options()).filter(*criteria).first()
+    if db_product is None:
+        return None
+    return db_product.id, build_entry(to_json(PRODUCT, db_product))
+
+
+async def _cached_product(db: AsyncSession, request: Request, cache_key: str, *criteria):
+    entry = await run_in_threadpool(catalog_cache.get, cache_key)
     
-    if not product:
+    if entry is None:
+        found = await db.run_sync(_product_entry, *criteria)
+        if found is not None:
+            product_id, entry = found
+            await run_in_threadpool(catalog_cache.set, cache_key, entry, tags=["products", f"product:{product_id}"])
+    
+    if entry is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found"
         )
     
-    return product
+    return conditional_response(request, entry, settings.HTTP_CACHE_PRODUCTS)
+
+
+@router.get("/{product_id}", response_model=ProductResponse)
+async def get_product(product_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await _cached_product(db, request, f"products:id:{product_id}", Product.id == product_id)
 
 
 @router.get("/slug/{slug}", response_model=ProductResponse)
-def get_product_by_slug(slug: str, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.slug == slug).first()
-    
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found"
-        )
-    
-    return product
+async def get_product_by_slug(slug: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await _cached_product(db, request, f"products:slug:{slug}", Product.slug == slug)
 
 
 @router.post("/", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
@@ -90,8 +155,10 @@ def create_product(
     
     new_product = Product(**product_data.model_dump())
     db.add(new_product)
+    update_counters(db, total_products=1)
     db.commit()
     db.refresh(new_product)
+    catalog_cache.invalidate("products")
     
     return new_product
 
@@ -127,8 +194,13 @@ def update_product(
     for key, value in update_data.items():
         setattr(product, key, value)
     
+    if "stock_quantity" in update_data:
+        # Sharded products keep their stock in the shards
+        sync_shards(db, [product.id])
+    
     db.commit()
     db.refresh(product)
+    catalog_cache.invalidate("products")
     
     return product
 
@@ -157,12 +229,16 @@ def delete_product(
         )
     
     # Delete associated cart items
-    from models import CartItem
+    from models import CartItem, StockReservation, ProductStockShard
     db.query(CartItem).filter(CartItem.product_id == product_id).delete()
+    db.query(StockReservation).filter(StockReservation.product_id == product_id).delete()
+    db.query(ProductStockShard).filter(ProductStockShard.product_id == product_id).delete()
     
     # Reviews will be automatically deleted due to cascade setting
     
     db.delete(product)
+    update_counters(db, total_products=-1)
     db.commit()
+    catalog_cache.invalidate("products")
     
     return None
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from typing import List, Optional
 from database import get_db
-from models import ProductReview, User, Product, Order, OrderItem
+from models import ProductReview, User, Product, Order, OrderItem, ProductRatingSummary
 from auth import get_current_user
+from pagination import seek_by_created, fetch_page
+from loaders import review_options
+from ratings import record_rating_change
+from cache import catalog_cache
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -92,7 +95,10 @@ def create_review(
     )
     
     db.add(db_review)
+    db.flush()
+    record_rating_change(db, review.product_id, added=review.rating)
     db.commit()
+    catalog_cache.invalidate("ratings")
     db.refresh(db_review)
     
     # Add user_name for response
@@ -104,20 +110,23 @@ def create_review(
 @router.get("/product/{product_id}", response_model=List[ReviewResponse])
 def get_product_reviews(
     product_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 20,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Get all reviews for a product"""
     
-    reviews = db.query(ProductReview).filter(
+    query = db.query(ProductReview).options(*review_options()).filter(
         ProductReview.product_id == product_id
-    ).order_by(ProductReview.created_at.desc()).offset(skip).limit(limit).all()
+    )
+    query = seek_by_created(query, ProductReview.created_at, ProductReview.id, cursor).offset(skip)
+    reviews = fetch_page(query, limit, response, lambda review: (review.created_at, review.id))
     
     # Add user names
     for review in reviews:
-        user = db.query(User).filter(User.id == review.user_id).first()
-        review.user_name = user.full_name if user else "Anonymous"
+        review.user_name = review.user.full_name if review.user else "Anonymous"
     
     return reviews
 
@@ -126,28 +135,20 @@ def get_product_reviews(
 def get_product_rating(product_id: int, db: Session = Depends(get_db)):
     """Get average rating and distribution for a product"""
     
-    # Get average rating and count
-    result = db.query(
-        func.avg(ProductReview.rating).label('average'),
-        func.count(ProductReview.id).label('total')
-    ).filter(ProductReview.product_id == product_id).first()
-    
-    average_rating = float(result.average) if result.average else 0.0
-    total_reviews = result.total
-    
-    # Get rating distribution
-    distribution = {}
-    for rating in range(1, 6):
-        count = db.query(ProductReview).filter(
-            ProductReview.product_id == product_id,
-            ProductReview.rating == rating
-        ).count()
-        distribution[str(rating)] = count
+    summary = db.get(ProductRatingSummary, product_id)
+    if summary is None:
+        return {
+            "average_rating": 0.0,
+            "total_reviews": 0,
+            "rating_distribution": {str(rating): 0 for rating in range(1, 6)}
+        }
     
     return {
-        "average_rating": round(average_rating, 1),
-        "total_reviews": total_reviews,
-        "rating_distribution": distribution
+        "average_rating": round(summary.average_rating, 1),
+        "total_reviews": summary.total_reviews,
+        "rating_distribution": {
+            str(rating): getattr(summary, f"rating_{rating}") for rating in range(1, 6)
+        }
     }
 
 
@@ -193,8 +194,11 @@ def update_review(
         )
     
     # Update fields
-    if review_update.rating is not None:
+    if review_update.rating is not None and review_update.rating != db_review.rating:
+        old_rating = db_review.rating
         db_review.rating = review_update.rating
+        db.flush()
+        record_rating_change(db, db_review.product_id, added=db_review.rating, removed=old_rating)
     if review_update.title is not None:
         db_review.title = review_update.title
     if review_update.comment is not None:
@@ -202,6 +206,7 @@ def update_review(
     
     db.commit()
     db.refresh(db_review)
+    catalog_cache.invalidate("ratings")
     
     # Add user name
     db_review.user_name = current_user.full_name
@@ -232,6 +237,9 @@ def delete_review(
         )
     
     db.delete(db_review)
+    db.flush()
+    record_rating_change(db, db_review.product_id, removed=db_review.rating)
     db.commit()
+    catalog_cache.invalidate("ratings")
     
     return None
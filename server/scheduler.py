@@ -7,8 +7,16 @@ from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from database import SessionLocal
-from models import User
+from models import User, UserRole, CartItem, ProductReview
+from ratings import rebuild_all_rating_summaries, rebuild_rating_summaries as rebuild_product_summaries
+from email_service import drain_outbox
+from counters import fold_counter_deltas, reconcile_counters, update_counters
+from analytics import roll_up_new_orders, purge_hourly_rollups
+from inventory import release_expired_reservations, refresh_sharded_totals
+from leases import leased_job, lease_backend, job_runs, HOLDER
+from config import settings
 import logging
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,52 +24,254 @@ logger = logging.getLogger(__name__)
 scheduler = AsyncIOScheduler()
 
 
+def _delete_unverified_batch(db: Session, cutoff: datetime, after_id: int) -> tuple:
+    """Delete the next batch of stale unverified users above ``after_id`` in one transaction.
+
+    Returns (last id in the batch, users deleted, whether it was the last batch).
+    """
+    # Locked so a user verifying right now is either skipped or waits for us
+    rows = db.query(User.id, User.role).filter(
+        User.is_verified == False,
+        User.created_at < cutoff,
+        User.id > after_id,
+        ~User.orders.any()
+    ).order_by(User.id).limit(settings.CLEANUP_BATCH_SIZE).with_for_update(skip_locked=True).all()
+    if not rows:
+        return after_id, 0, True
+    
+    user_ids = [user_id for user_id, _ in rows]
+    reviewed_products = [
+        product_id for (product_id,) in
+        db.query(ProductReview.product_id).filter(ProductReview.user_id.in_(user_ids)).distinct()
+    ]
+    
+    # Children first, then the users, each as one set-based DELETE
+    db.query(CartItem).filter(CartItem.user_id.in_(user_ids)).delete(synchronize_session=False)
+    db.query(ProductReview).filter(ProductReview.user_id.in_(user_ids)).delete(synchronize_session=False)
+    deleted = db.query(User).filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+    
+    rebuild_product_summaries(db, reviewed_products)
+    customers = sum(1 for _, role in rows if role == UserRole.CUSTOMER)
+    update_counters(db, total_customers=-customers)
+    db.commit()
+    return user_ids[-1], deleted, len(rows) < settings.CLEANUP_BATCH_SIZE
+
+
 def cleanup_unverified_users():
     """Delete users who haven't verified their email after 24 hours"""
     db: Session = SessionLocal()
+    started = time.perf_counter()
+    deleted = batches = 0
     try:
         cutoff_time = datetime.utcnow() - timedelta(hours=24)
+        last_id = 0
         
-        unverified_users = db.query(User).filter(
-            User.is_verified == False,
-            User.created_at < cutoff_time
-        ).all()
+        # Short transactions in id order, pausing between them, so a signup
+        # wave never turns into one long lock on users
+        while True:
+            last_id, batch_deleted, done = _delete_unverified_batch(db, cutoff_time, last_id)
+            if batch_deleted:
+                deleted += batch_deleted
+                batches += 1
+            if done:
+                break
+            time.sleep(settings.CLEANUP_PAUSE_SECONDS)
         
-        if unverified_users:
-            logger.info(f"Found {len(unverified_users)} unverified users to delete")
-            
-            for user in unverified_users:
-                logger.info(f"Deleting unverified user: {user.email}")
-                db.delete(user)
-            
-            db.commit()
-            logger.info(f"Successfully deleted {len(unverified_users)} unverified users")
-        else:
-            logger.info("No unverified users to delete")
-            
     except Exception as e:
         logger.error(f"Error during cleanup: {str(e)}")
         db.rollback()
+        raise
+    finally:
+        db.close()
+    
+    logger.info(
+        f"Unverified user cleanup: {deleted} deleted in {batches} batches, "
+        f"{time.perf_counter() - started:.2f}s"
+    )
+
+
+def rebuild_rating_summaries():
+    """Correct drift in the per-product rating summaries"""
+    db: Session = SessionLocal()
+    try:
+        corrected = rebuild_all_rating_summaries(db)
+        logger.info(f"Rating summaries rebuilt, {corrected} corrected")
+    except Exception as e:
+        logger.error(f"Error rebuilding rating summaries: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def reconcile_dashboard_counters():
+    """Correct drift in the admin dashboard counters"""
+    db: Session = SessionLocal()
+    try:
+        corrected = reconcile_counters(db)
+        if corrected:
+            logger.warning(f"Dashboard counters reconciled, {corrected} corrected")
+    except Exception as e:
+        logger.error(f"Error reconciling dashboard counters: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def fold_dashboard_counters():
+    """Move pending dashboard counter deltas into the totals"""
+    db: Session = SessionLocal()
+    try:
+        while fold_counter_deltas(db, settings.STAT_COUNTER_FOLD_BATCH_SIZE) == settings.STAT_COUNTER_FOLD_BATCH_SIZE:
+            pass
+    except Exception as e:
+        logger.error(f"Error folding dashboard counters: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def update_sales_rollups():
+    """Fold new orders into the analytics rollups"""
+    db: Session = SessionLocal()
+    try:
+        rolled_up = roll_up_new_orders(db, settings.ANALYTICS_RECOMPUTE_HOURS)
+        purged = purge_hourly_rollups(db, settings.ANALYTICS_HOURLY_RETENTION_DAYS)
+        if rolled_up or purged:
+            logger.info(f"Sales rollups updated: {rolled_up} new orders, {purged} hourly rows purged")
+    except Exception as e:
+        logger.error(f"Error updating sales rollups: {str(e)}")
+        db.rollback()
+        raise
     finally:
         db.close()
 
 
+def release_stock_reservations():
+    """Return expired reservations to stock and refresh sharded stock totals"""
+    db: Session = SessionLocal()
+    try:
+        released = 0
+        while True:
+            batch = release_expired_reservations(db, settings.STOCK_RELEASE_BATCH_SIZE)
+            released += batch
+            if batch < settings.STOCK_RELEASE_BATCH_SIZE:
+                break
+        refresh_sharded_totals(db)
+        if released:
+            logger.info(f"Stock reservations released: {released}")
+    except Exception as e:
+        logger.error(f"Error releasing stock reservations: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def drain_email_outbox():
+    """Send queued transactional emails"""
+    db: Session = SessionLocal()
+    try:
+        result = drain_outbox(db)
+        if result["claimed"]:
+            logger.info(f"Email outbox drained: {result['sent']} sent, {result['unsent']} not sent")
+    except Exception as e:
+        logger.error(f"Error draining email outbox: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def wake_email_outbox():
+    """Drain the outbox now instead of at the next poll"""
+    job = scheduler.get_job('drain_email_outbox')
+    if job is not None:
+        job.modify(next_run_time=datetime.now(scheduler.timezone))
+
+
+# Leased jobs: (id, name, function, interval in seconds). Each runs once per
+# interval across the whole cluster
+LEASED_JOBS = [
+    # Clean up unverified users every hour
+    ('cleanup_unverified_users', 'Delete unverified users older than 24 hours', cleanup_unverified_users, 3600),
+    # Rebuild rating summaries once a day
+    ('rebuild_rating_summaries', 'Rebuild product rating summaries', rebuild_rating_summaries, 24 * 3600),
+    # Reconcile dashboard counters every hour
+    ('reconcile_dashboard_counters', 'Reconcile admin dashboard counters', reconcile_dashboard_counters, 3600),
+    # Fold counter deltas so the dashboard sums few rows
+    ('fold_dashboard_counters', 'Fold admin dashboard counter deltas', fold_dashboard_counters,
+     settings.STAT_COUNTER_FOLD_SECONDS),
+    # Roll new orders up for the analytics endpoint
+    ('update_sales_rollups', 'Update sales analytics rollups', update_sales_rollups,
+     settings.ANALYTICS_ROLLUP_MINUTES * 60),
+    # Return expired stock reservations
+    ('release_stock_reservations', 'Release expired stock reservations', release_stock_reservations,
+     settings.STOCK_RELEASE_SECONDS),
+]
+
+
 def start_scheduler():
     """Start the scheduler"""
-    # Run cleanup every hour
+    for job_id, name, fn, interval_seconds in LEASED_JOBS:
+        scheduler.add_job(
+            leased_job(job_id, interval_seconds, fn),
+            trigger=IntervalTrigger(seconds=interval_seconds),
+            id=job_id,
+            name=name,
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+    
+    # Send queued emails. Not leased: every worker may drain, SKIP LOCKED
+    # hands each message to exactly one of them
     scheduler.add_job(
-        cleanup_unverified_users,
-        trigger=IntervalTrigger(hours=1),
-        id='cleanup_unverified_users',
-        name='Delete unverified users older than 24 hours',
+        drain_email_outbox,
+        trigger=IntervalTrigger(seconds=settings.OUTBOX_POLL_SECONDS),
+        id='drain_email_outbox',
+        name='Send queued emails',
+        max_instances=1,
+        coalesce=True,
         replace_existing=True
     )
     
     scheduler.start()
-    logger.info("Scheduler started - cleanup task will run every hour")
+    logger.info(f"Scheduler started - job leases: {lease_backend()}")
+
+
+def run_jobs() -> dict:
+    """Run every job once, for deployments without the in-process scheduler.
+
+    Call it from cron (``manage.py run-jobs`` or ``GET /api/cron/jobs``) at
+    least every OUTBOX_POLL_SECONDS or as often as the cron allows. Leased
+    jobs still run at most once per interval, so calling it more often only
+    drains the outbox. Returns each job's outcome.
+    """
+    outcomes = {}
+    for job_id, name, fn, interval_seconds in LEASED_JOBS:
+        outcomes[job_id] = leased_job(job_id, interval_seconds, fn)()
+    drain_email_outbox()
+    outcomes['drain_email_outbox'] = "ran"
+    return outcomes
+
+
+def scheduler_status(db: Session) -> dict:
+    """Lease backend, this worker's next run times and every job's last run"""
+    return {
+        "lease_backend": lease_backend(),
+        "holder": HOLDER,
+        "next_run_times": {
+            job.id: job.next_run_time for job in scheduler.get_jobs()
+        },
+        "jobs": job_runs(db),
+    }
 
 
 def shutdown_scheduler():
     """Shutdown the scheduler"""
+    if not scheduler.running:
+        return
     scheduler.shutdown()
     logger.info("Scheduler shutdown")
\ No newline at end of file
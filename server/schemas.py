@@ -116,6 +116,9 @@ class ProductUpdate(BaseModel):
 class ProductResponse(ProductBase):
     id: int
     category: Optional[CategoryResponse] = None
+    # Only filled in by listings requested with include_ratings
+    average_rating: Optional[float] = None
+    total_reviews: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -133,6 +136,11 @@ class CartItemUpdate(BaseModel):
     quantity: int = Field(gt=0)
 
 
+class CartSync(BaseModel):
+    # The whole desired cart; products left out are removed
+    items: List[CartItemCreate] = Field(max_length=200)
+
+
 class CartItemResponse(BaseModel):
     id: int
     product: ProductResponse
@@ -198,6 +206,24 @@ class OrderResponse(BaseModel):
         from_attributes = True
 
 
+class ReservedItem(BaseModel):
+    product_id: int
+    quantity: int
+
+
+class CheckoutReservation(BaseModel):
+    expires_at: datetime
+    items: List[ReservedItem]
+
+
+class StockStatus(BaseModel):
+    product_id: int
+    stock_quantity: int
+    reserved: int
+    shards: int
+    shard_stock: List[int]
+
+
 class DashboardStats(BaseModel):
     total_orders: int
     total_revenue: float
@@ -207,6 +233,57 @@ class DashboardStats(BaseModel):
     low_stock_products: int
 
 
+class AnalyticsPoint(BaseModel):
+    bucket: datetime
+    orders: int
+    revenue: float
+    units: int
+
+
+class AnalyticsBreakdown(BaseModel):
+    id: Optional[int] = None
+    name: Optional[str] = None
+    orders: Optional[int] = None
+    units: int
+    revenue: float
+
+
+class AnalyticsTotals(BaseModel):
+    orders: int
+    revenue: float
+    units: int
+
+
+class AnalyticsResponse(BaseModel):
+    granularity: str
+    start: datetime
+    end: datetime
+    totals: AnalyticsTotals
+    series: List[AnalyticsPoint]
+    top_products: List[AnalyticsBreakdown]
+    categories: List[AnalyticsBreakdown]
+
+
+class ProductImportUpdate(ProductUpdate):
+    # An import row for an existing product: only the slug is required
+    slug: str
+
+
+class ProductImportError(BaseModel):
+    row: Optional[int] = None
+    error: str
+
+
+class ProductImportResult(BaseModel):
+    processed: int
+    created: int
+    updated: int
+    failed: int
+    errors: List[ProductImportError]
+    errors_truncated: bool
+    aborted: Optional[str] = None
+
+
 # Hero Banner Schemas
 class HeroBannerBase(BaseModel):
     title: Optional[str] = None
@@ -0,0 +1,137 @@
+"""
+Full-text product search
+
+PostgreSQL keeps a generated ``products.search_vector`` tsvector column with a
+GIN index on it. SQLite keeps an FTS5 shadow table (``products_fts``) in sync
+with triggers. Any other backend falls back to a plain ``ILIKE`` scan.
+"""
+
+import re
+from sqlalchemy import event, func, inspect, literal_column, table, column
+from sqlalchemy.orm import Query
+from models import Product
+from config import settings
+
+# Weight A for the name, B for the description so title hits rank first
+POSTGRES_SEARCH_DDL = [
+    f"""
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{settings.SEARCH_LANGUAGE}', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('{settings.SEARCH_LANGUAGE}', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (search_vector)",
+]
+
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description,
+        content='products', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+]
+
+products_fts = table("products_fts", column("rowid"))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(term: str):
+    return _TOKEN_RE.findall(term.lower())
+
+
+def apply_product_search(query: Query, term: str) -> Query:
+    """Filter a product query by ``term`` and order it by relevance.
+
+    Every word is matched as a prefix, so partial input from the storefront
+    search box ("hand wov") already finds "handmade woven rug".
+    """
+    tokens = _tokens(term)
+    if not tokens:
+        return query
+
+    dialect = query.session.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        search_vector = literal_column("products.search_vector")
+        ts_query = func.to_tsquery(
+            settings.SEARCH_LANGUAGE,
+            " & ".join(f"{token}:*" for token in tokens)
+        )
+        return query.filter(search_vector.op("@@")(ts_query)).order_by(
+            func.ts_rank_cd(search_vector, ts_query).desc(),
+            Product.id
+        )
+
+    if dialect == "sqlite":
+        match = " ".join(f'"{token}"*' for token in tokens)
+        return query.join(products_fts, products_fts.c.rowid == Product.id).filter(
+            literal_column("products_fts").op("MATCH")(match)
+        ).order_by(
+            # bm25() is lower-is-better; weight name hits above description hits
+            func.bm25(literal_column("products_fts"), 10.0, 1.0),
+            Product.id
+        )
+
+    pattern = f"%{term}%"
+    return query.filter(
+        (Product.name.ilike(pattern)) |
+        (Product.description.ilike(pattern))
+    )
+
+
+def install_search_index(target, connection, **kw):
+    """Create the dialect specific search objects next to the products table"""
+    if connection.dialect.name == "postgresql":
+        statements = POSTGRES_SEARCH_DDL
+    elif connection.dialect.name == "sqlite":
+        statements = SQLITE_SEARCH_DDL
+    else:
+        return
+
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+def search_index_installed(connection) -> bool:
+    """Whether the products table has its dialect specific search objects"""
+    if connection.dialect.name == "postgresql":
+        columns = {c["name"] for c in inspect(connection).get_columns("products")}
+        return "search_vector" in columns
+    if connection.dialect.name == "sqlite":
+        names = {
+            name for (name,) in connection.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE name LIKE 'products_fts%'"
+            )
+        }
+        return {"products_fts", "products_fts_ai", "products_fts_ad", "products_fts_au"} <= names
+    return True
+
+
+# Fresh databases built with Base.metadata.create_all() get the index too;
+# existing ones are migrated by alembic (add_product_search)
+event.listen(Product.__table__, "after_create", install_search_index)
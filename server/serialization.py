@@ -0,0 +1,41 @@
+"""
+Fast JSON for large read responses
+
+Returning ORM objects or dicts from a route with a ``response_model`` makes
+FastAPI validate them, run ``jsonable_encoder`` over the result and then
+``json.dumps`` it. The list endpoints instead validate the ORM rows once
+with a precompiled TypeAdapter and let pydantic-core write JSON directly,
+then return the text as-is. The routes keep their ``response_model`` for
+the OpenAPI schema. The catalog cache stores this text, so a cache hit
+does no serialization at all.
+"""
+
+from typing import Any, List, Optional
+from fastapi import Response
+from pydantic import TypeAdapter
+from schemas import (
+    ProductResponse, CategoryResponse, OrderResponse, CartItemResponse,
+    HeroBannerResponse, AboutPageResponse
+)
+from pagination import NEXT_CURSOR_HEADER
+
+# Built once at import: the schema is compiled when the adapter is created
+PRODUCT = TypeAdapter(ProductResponse)
+PRODUCT_LIST = TypeAdapter(List[ProductResponse])
+CATEGORY = TypeAdapter(CategoryResponse)
+CATEGORY_LIST = TypeAdapter(List[CategoryResponse])
+ORDER_LIST = TypeAdapter(List[OrderResponse])
+CART_ITEM_LIST = TypeAdapter(List[CartItemResponse])
+HERO_BANNER_LIST = TypeAdapter(List[HeroBannerResponse])
+ABOUT_PAGE = TypeAdapter(Optional[AboutPageResponse])
+
+
+def to_json(adapter: TypeAdapter, value: Any) -> str:
+    """Validate ORM object(s) against ``adapter`` and serialize them in one pass"""
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True)).decode("utf-8")
+
+
+def json_response(body: str, next_cursor: Optional[str] = None, status_code: int = 200) -> Response:
+    """Already serialized JSON; FastAPI sends Response instances untouched"""
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,113 @@
+import os
+import tempfile
+
+# Settings are read at import time: point them at a throwaway SQLite database
+_db_dir = tempfile.mkdtemp()
+for name, value in {
+    "DATABASE_URL": f"sqlite:///{_db_dir}/test.db",
+    "SECRET_KEY": "test-secret",
+    "MAIL_USERNAME": "test",
+    "MAIL_PASSWORD": "test",
+    "MAIL_FROM": "noreply@example.com",
+    "MAIL_SERVER": "localhost",
+    "FRONTEND_URL": "http://localhost:3000",
+    "ADMIN_EMAIL": "admin@example.com",
+    "ADMIN_PASSWORD": "admin-password",
+    "CACHE_REDIS_ENABLED": "false",
+    "STARTUP_SCHEDULER": "false",
+}.items():
+    os.environ.setdefault(name, value)
+
+import uuid
+from contextlib import contextmanager
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from database import SessionLocal, engine
+from models import Category, Order, OrderItem, OrderStatus, Product, ProductReview, User, UserRole
+from auth import get_password_hash
+
+
+@pytest.fixture(scope="session")
+def client():
+    from api.main import app
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def customer(client, db):
+    """A verified customer and the headers to act as them"""
+    email = f"customer-{uuid.uuid4().hex[:8]}@example.com"
+    user = User(
+        email=email, full_name="Customer", hashed_password=get_password_hash("password"),
+        role=UserRole.CUSTOMER, is_active=True, is_verified=True
+    )
+    db.add(user)
+    db.commit()
+    token = client.post("/api/auth/login", data={"username": email, "password": "password"}).json()["access_token"]
+    return user, {"Authorization": f"Bearer {token}"}
+
+
+@contextmanager
+def count_statements():
+    """Counts the SQL statements executed inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def make_products(db, count: int) -> list:
+    tag = uuid.uuid4().hex[:8]
+    category = Category(name=f"Rugs {tag}", slug=f"rugs-{tag}")
+    db.add(category)
+    db.flush()
+    products = [
+        Product(name=f"Rug {i}", slug=f"rug-{uuid.uuid4().hex[:12]}", price=10, stock_quantity=100, category_id=category.id)
+        for i in range(count)
+    ]
+    db.add_all(products)
+    db.commit()
+    return products
+
+
+def make_orders(db, user, products: list, count: int) -> list:
+    orders = [
+        Order(
+            order_number=uuid.uuid4().hex[:10].upper(), user_id=user.id, status=OrderStatus.PENDING,
+            total_amount=30, shipping_address="1 Street", shipping_city="City",
+            shipping_postal_code="00000", shipping_country="Country",
+            customer_name="Customer", customer_email=user.email,
+            order_items=[OrderItem(product_id=product.id, quantity=1, price=10) for product in products],
+        )
+        for _ in range(count)
+    ]
+    db.add_all(orders)
+    db.commit()
+    return orders
+
+
+def make_reviews(db, user, product, count: int) -> list:
+    reviews = [
+        ProductReview(product_id=product.id, user_id=user.id, rating=5, comment="Lovely rug")
+        for _ in range(count)
+    ]
+    db.add_all(reviews)
+    db.commit()
+    return reviews
@@ -0,0 +1,26 @@
+"""
+Sales analytics backfill endpoint
+"""
+
+
+def admin_headers(client) -> dict:
+    token = client.post(
+        "/api/auth/login", data={"username": "admin@example.com", "password": "admin-password"}
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_backfill_needs_a_bounded_range(client):
+    headers = admin_headers(client)
+
+    assert client.post("/api/admin/analytics/backfill", headers=headers).status_code == 422
+    too_long = client.post(
+        "/api/admin/analytics/backfill?start=2024-01-01T00:00:00&end=2024-06-01T00:00:00", headers=headers
+    )
+    assert too_long.status_code == 400
+
+    response = client.post(
+        "/api/admin/analytics/backfill?start=2024-01-01T00:00:00&end=2024-01-08T00:00:00", headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json() == {"days": 7}
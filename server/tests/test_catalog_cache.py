@@ -0,0 +1,23 @@
+"""
+Catalog cache invalidation
+"""
+
+from conftest import make_products
+
+
+ORDER = {
+    "shipping_address": "1 Street", "shipping_city": "City", "shipping_postal_code": "00000",
+    "shipping_country": "Country", "customer_name": "Customer", "customer_email": "customer@example.com",
+}
+
+
+def test_product_listing_shows_stock_after_an_order(client, db, customer):
+    _, headers = customer
+    product = make_products(db, 1)[0]
+    url = f"/api/products/?category_id={product.category_id}"
+
+    assert client.get(url).json()[0]["stock_quantity"] == 100
+    response = client.post("/api/orders/", headers=headers, json={**ORDER, "items": [{"product_id": product.id, "quantity": 3}]})
+    assert response.status_code == 201
+
+    assert client.get(url).json()[0]["stock_quantity"] == 97
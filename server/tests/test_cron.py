@@ -0,0 +1,27 @@
+"""
+GET /api/cron/jobs: the background jobs for deployments without the scheduler
+"""
+
+from config import settings
+
+
+def test_cron_jobs_is_off_without_a_secret(client, monkeypatch):
+    monkeypatch.setattr(settings, "CRON_SECRET", None)
+    assert client.get("/api/cron/jobs").status_code == 404
+
+
+def test_cron_jobs_needs_the_secret(client, monkeypatch):
+    monkeypatch.setattr(settings, "CRON_SECRET", "cron-secret")
+    assert client.get("/api/cron/jobs").status_code == 401
+    assert client.get("/api/cron/jobs", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+
+def test_cron_jobs_runs_every_job(client, monkeypatch):
+    monkeypatch.setattr(settings, "CRON_SECRET", "cron-secret")
+    response = client.get("/api/cron/jobs", headers={"Authorization": "Bearer cron-secret"})
+
+    assert response.status_code == 200
+    outcomes = response.json()
+    assert outcomes["drain_email_outbox"] == "ran"
+    assert outcomes["update_sales_rollups"] in ("succeeded", "skipped")
+    assert "failed" not in outcomes.values()
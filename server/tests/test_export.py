@@ -0,0 +1,26 @@
+"""
+Admin CSV exports
+"""
+
+import csv
+import io
+from conftest import make_orders, make_products
+
+
+def test_csv_export_neutralises_formulas(client, db, customer):
+    user, _ = customer
+    order = make_orders(db, user, make_products(db, 1), 1)[0]
+    order.customer_name = '=HYPERLINK("http://example.com","Click")'
+    order.notes = "-2+3"
+    db.commit()
+    token = client.post(
+        "/api/auth/login", data={"username": "admin@example.com", "password": "admin-password"}
+    ).json()["access_token"]
+
+    response = client.get("/api/admin/export/orders?format=csv", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    row = next(row for row in csv.DictReader(io.StringIO(response.text)) if row["order_id"] == str(order.id))
+    assert row["customer_name"] == '\'=HYPERLINK("http://example.com","Click")'
+    assert row["notes"] == "'-2+3"
+    assert row["total_amount"] == "30.0"
@@ -0,0 +1,38 @@
+"""
+Keyset pagination: following X-Next-Cursor visits every row exactly once
+"""
+
+from conftest import make_orders, make_products, make_reviews
+
+
+def walk(client, url: str, headers: dict) -> list:
+    ids = []
+    cursor = None
+    for _ in range(50):
+        response = client.get(url, params={"cursor": cursor} if cursor else None, headers=headers)
+        assert response.status_code == 200
+        ids.extend(row["id"] for row in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+    raise AssertionError(f"{url} did not reach its last page: {ids}")
+
+
+def test_orders_cursor_walks_every_page(client, db, customer):
+    user, headers = customer
+    # Created within the same second, with created_at set by the database
+    orders = make_orders(db, user, make_products(db, 1), 7)
+
+    ids = walk(client, "/api/orders/?limit=2", headers)
+
+    assert ids == sorted((order.id for order in orders), reverse=True)
+
+
+def test_reviews_cursor_walks_every_page(client, db, customer):
+    user, headers = customer
+    product = make_products(db, 1)[0]
+    reviews = make_reviews(db, user, product, 7)
+
+    ids = walk(client, f"/api/reviews/product/{product.id}?limit=2", headers)
+
+    assert ids == sorted((review.id for review in reviews), reverse=True)
@@ -0,0 +1,99 @@
+"""
+Statement counts for the endpoints that return nested trees
+
+Each endpoint loads its whole response tree with a fixed number of
+statements, so the count for a large result must equal the count for a
+small one.
+"""
+
+import uuid
+from config import settings
+from models import CartItem, User, UserRole
+from conftest import count_statements, make_orders, make_products, make_reviews
+
+
+def statements_for(client, url: str, headers: dict = None) -> int:
+    # Warm up first: the authenticated principal is cached after one request
+    assert client.get(url, headers=headers).status_code == 200
+    with count_statements() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_get_orders_statement_count_does_not_grow(client, db, customer):
+    user, headers = customer
+    products = make_products(db, 3)
+    make_orders(db, user, products, 1)
+    one = statements_for(client, "/api/orders/?limit=100", headers)
+
+    make_orders(db, user, products, 99)
+    response = client.get("/api/orders/?limit=100", headers=headers)
+    assert len(response.json()) == 100
+    assert all(len(order["order_items"]) == 3 for order in response.json())
+    hundred = statements_for(client, "/api/orders/?limit=100", headers)
+
+    assert hundred == one
+    assert hundred <= 3
+
+
+def test_get_order_statement_count_does_not_grow(client, db, customer):
+    user, headers = customer
+    small = make_orders(db, user, make_products(db, 1), 1)[0]
+    large = make_orders(db, user, make_products(db, 20), 1)[0]
+
+    assert client.get(f"/api/orders/{large.id}", headers=headers).json()["order_items"][19]["product"]["category"]
+    assert statements_for(client, f"/api/orders/{large.id}", headers) == \
+        statements_for(client, f"/api/orders/{small.id}", headers)
+    assert statements_for(client, f"/api/orders/{large.id}", headers) <= 2
+
+
+def test_get_cart_statement_count_does_not_grow(client, db, customer):
+    user, headers = customer
+    products = make_products(db, 30)
+    db.add(CartItem(user_id=user.id, product_id=products[0].id, quantity=1))
+    db.commit()
+    one = statements_for(client, "/api/cart/", headers)
+
+    db.add_all([CartItem(user_id=user.id, product_id=product.id, quantity=1) for product in products[1:]])
+    db.commit()
+    assert len(client.get("/api/cart/", headers=headers).json()) == 30
+    thirty = statements_for(client, "/api/cart/", headers)
+
+    assert thirty == one
+    assert thirty <= 1
+
+
+def test_get_products_statement_count_does_not_grow(client, db, monkeypatch):
+    # Count the queries, not catalog cache hits
+    monkeypatch.setattr(settings, "CACHE_ENABLED", False)
+    one = make_products(db, 1)[0].category_id
+    fifty = make_products(db, 50)[0].category_id
+    assert len(client.get(f"/api/products/?category_id={fifty}").json()) == 50
+
+    for ratings in ("false", "true"):
+        small = statements_for(client, f"/api/products/?category_id={one}&include_ratings={ratings}")
+        large = statements_for(client, f"/api/products/?category_id={fifty}&include_ratings={ratings}")
+        assert large == small
+        assert large <= (2 if ratings == "true" else 1)
+
+
+def test_get_product_reviews_statement_count_does_not_grow(client, db):
+    small, large = make_products(db, 2)
+    reviewers = [
+        User(
+            email=f"reviewer-{uuid.uuid4().hex[:8]}@example.com", full_name="Reviewer", hashed_password="!",
+            role=UserRole.CUSTOMER, is_active=True, is_verified=True
+        )
+        for _ in range(20)
+    ]
+    db.add_all(reviewers)
+    db.commit()
+    make_reviews(db, reviewers[0], small, 1)
+    for reviewer in reviewers:
+        make_reviews(db, reviewer, large, 1)
+
+    assert {review["user_name"] for review in client.get(f"/api/reviews/product/{large.id}?limit=20").json()} == {"Reviewer"}
+    assert statements_for(client, f"/api/reviews/product/{large.id}?limit=20") == \
+        statements_for(client, f"/api/reviews/product/{small.id}?limit=20")
+    assert statements_for(client, f"/api/reviews/product/{large.id}?limit=20") <= 1